@@ -0,0 +1,274 @@
+"""
+Check that a /move allocates nothing between the request buffer and the PWM.
+
+Runs a pooled Request through parsing, route lookup and ``handle_move``,
+then the command mailbox and a motion tick down to the servo write,
+``MOVES`` times with changing positions, and fails (exit status 1) if
+anything was allocated. Reading the socket and writing the response are
+left out: they belong to the connection, not to the move.
+
+On the board this is exact: with the collector disabled every
+allocation shows up in ``gc.mem_alloc()``. The servos will move:
+
+    mpremote mount . run bench/alloc_check.py
+
+CPython frees temporaries at once and boxes every int, so there the
+check is indirect: the controller, engine and mailbox state must stay
+in ints below 2**30 (floats and larger ints are heap objects on
+MicroPython), no memory may be retained per move, and the memory a
+move holds at its peak must stay within the few boxed ints it needs.
+The peak check is run once more with a ``/move`` handler that builds a
+bytes label per move, and must fail on that one.
+
+Both also record motion tick timings into a histogram whose total is
+already close to 2**30 us, as after 18 minutes of ticks:
+
+    python bench/alloc_check.py
+"""
+import gc
+import sys
+
+MICROPYTHON = sys.implementation.name == 'micropython'
+
+if MICROPYTHON:
+    sys.path.append('lib')
+else:
+    import os
+    import tracemalloc
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import sim
+    sim.install()
+    from machine import PWM
+
+import metrics  # noqa: E402
+import web_joystick  # noqa: E402
+from cmdmailbox import CommandMailbox  # noqa: E402
+from httpreq import Request  # noqa: E402
+from sequencer import Sequencer  # noqa: E402
+from servocontrollerv2 import ServoController, MotionEngine  # noqa: E402
+from trajectory import Player  # noqa: E402
+
+MOVES = 2000
+WARMUP = 50
+PEAK_BYTES = 272  # Typical move peak on CPython: ints and bound methods come to ~240
+TEMPLATE = b'GET /move?x=000&y=000&s=00000 HTTP/1.1\r\nHost: pico\r\n\r\n'
+X_AT = TEMPLATE.find(b'x=') + 2
+Y_AT = TEMPLATE.find(b'y=') + 2
+S_AT = TEMPLATE.find(b's=') + 2
+
+
+seq = 0  # Sequence number of the last move; never reused, or the move is dropped as stale
+
+
+class NullWriter:
+    peer = ('192.168.4.2', 50000)
+
+    def write(self, data):
+        pass
+
+    def get_extra_info(self, name):
+        return self.peer if name == 'peername' else None
+
+
+def put_digits(buf, at, value, width):
+    # Write ``value`` as fixed-width decimal in place
+    for k in range(width - 1, -1, -1):
+        buf[at + k] = 0x30 + value % 10
+        value //= 10
+
+
+def setup():
+    controller = ServoController()
+    motion = MotionEngine(controller, mailbox=CommandMailbox(len(controller)))
+    web_joystick.SEQUENCER = Sequencer(motion)
+    web_joystick.PLAYER = Player(motion)
+    req = Request(web_joystick.REQUEST_SIZE)
+    req.buf[:len(TEMPLATE)] = TEMPLATE
+    return controller, motion, req, NullWriter()
+
+
+def one_move(motion, req, writer):
+    global seq
+    seq = (seq + 1) & 0xFFFF
+    req.reset()
+    req.length = len(TEMPLATE)
+    put_digits(req.buf, X_AT, seq % 101, 3)
+    put_digits(req.buf, Y_AT, 100 - seq % 101, 3)
+    put_digits(req.buf, S_AT, seq, 5)
+    req.head_end = req._find_head_end(0)
+    if not req.parse():
+        raise AssertionError("Request did not parse")
+    for path, handler in web_joystick.ROUTES:
+        if req.path_is(path):
+            if handler(req, None, writer, motion) is not None:
+                raise AssertionError("/move handler is a coroutine")
+            break
+    motion.tick()
+
+
+def moves(count, motion, req, writer):
+    for _ in range(count):
+        one_move(motion, req, writer)
+
+
+def applied_all(motion, applied, count, label):
+    # Every move posts pan and tilt, and the tick after it applies both
+    got = motion.mailbox.applied - applied
+    if got != 2 * count:
+        print(f"{label}: {got} of {2 * count} targets applied; the check measured dropped moves")
+        return False
+    return True
+
+
+def state_ints(controller, motion):
+    # Everything the hot path stores, which must stay small ints
+    values = controller._cdeg + controller._duty + motion._position + motion._target + motion._velocity
+    source = web_joystick.SEQ_SOURCES[NullWriter.peer[0]]
+    return values + motion.mailbox._target + [source.seq, source.ms]
+
+
+def check_micropython(motion, req, writer):
+    gc.collect()
+    gc.disable()
+    applied = motion.mailbox.applied
+    try:
+        before = gc.mem_alloc()
+        moves(MOVES, motion, req, writer)
+        allocated = gc.mem_alloc() - before
+    finally:
+        gc.enable()
+    print(f"{MOVES} moves allocated {allocated} bytes")
+    return applied_all(motion, applied, MOVES, "Allocation check") and allocated == 0
+
+
+def check_cpython(controller, motion, req, writer):
+    ok = True
+    for _ in range(MOVES // 10):
+        one_move(motion, req, writer)
+        for value in state_ints(controller, motion):
+            if value is not None and (type(value) is not int or not -(1 << 30) <= value < 1 << 30):
+                print(f"Hot path state holds {value!r}, which MicroPython allocates")
+                ok = False
+                break
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        moves(MOVES, motion, req, writer)
+        before = tracemalloc.take_snapshot()
+        applied = motion.mailbox.applied
+        moves(MOVES, motion, req, writer)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    # The stand-in PWM keeps a write history the real one does not
+    exclude = [tracemalloc.Filter(False, os.path.join(sim.SIM_DIR, '*'))]
+    growth = sum(stat.size_diff for stat in
+                 after.filter_traces(exclude).compare_to(before.filter_traces(exclude), 'filename'))
+    print(f"{MOVES} moves retained {growth} bytes")
+    # Boxed ints swapped in and out of the state lists account for a few KB
+    # whatever the count; retaining even one pointer per move is 8 bytes a move
+    ok = applied_all(motion, applied, MOVES, "Retention check") and ok and growth < 4 * MOVES
+    peak = move_peak(motion, req, writer)
+    print(f"Median move peaked at {peak} bytes (limit {PEAK_BYTES})")
+    ok = ok and peak is not None and peak <= PEAK_BYTES
+    routes = web_joystick.ROUTES
+    web_joystick.ROUTES = tuple((path, labelled_move if handler is web_joystick.handle_move else handler)
+                                for path, handler in routes)
+    try:
+        peak = move_peak(motion, req, writer)
+    finally:
+        web_joystick.ROUTES = routes
+    print(f"With a bytes label per move it peaked at {peak} bytes")
+    if peak is None or peak <= PEAK_BYTES:
+        print("The peak check missed an injected allocation")
+        ok = False
+    return ok
+
+
+def move_peak(motion, req, writer):
+    """
+    Get the median over ``MOVES`` moves of the most memory one move held
+    at a time, on top of what was allocated before it, or None if any
+    of the moves was not applied.
+
+    The stand-in PWM stops logging writes meanwhile, which the real one
+    never does. Every peak is read with ``get_traced_memory()``, which
+    cannot leave out files the way snapshots can.
+    """
+    peaks = []
+    applied = motion.mailbox.applied
+    gc.collect()
+    gc.disable()
+    PWM.record = False
+    tracemalloc.start()
+    try:
+        for _ in range(MOVES):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            one_move(motion, req, writer)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+        PWM.record = True
+        gc.enable()
+    if not applied_all(motion, applied, MOVES, "Peak check"):
+        return None
+    # A rare move also resizes a dict or list; a real allocation shows in all of them
+    peaks.sort()
+    return peaks[len(peaks) // 2]
+
+
+def labelled_move(req, reader, writer, motion):
+    # handle_move plus the kind of allocation the peak check must catch
+    ('move %d,%d' % (req.param_int(b'x'), req.param_int(b'y'))).encode() + req.param(b'x') + bytes(64)
+    return web_joystick.handle_move(req, reader, writer, motion)
+
+
+def check_histogram():
+    hist = metrics.Histogram()
+    tick_us = 20000
+    while hist.total < (1 << 30) - tick_us:
+        hist.record(tick_us)
+    expected = hist.total + MOVES * tick_us
+    if MICROPYTHON:
+        gc.collect()
+        gc.disable()
+        try:
+            before = gc.mem_alloc()
+            for _ in range(MOVES):
+                hist.record(tick_us)
+            allocated = gc.mem_alloc() - before
+        finally:
+            gc.enable()
+        ok = allocated == 0
+    else:
+        for _ in range(MOVES):
+            hist.record(tick_us)
+        allocated = None
+        ok = all(-(1 << 30) <= value < 1 << 30 for value in hist.__dict__.values() if type(value) is int)
+    ok = ok and hist.total == expected
+    print(f"Histogram past 2**30 us: total {hist.total}, allocated {allocated}, {'ok' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    controller, motion, req, writer = setup()
+    writes = sum(pwm.writes for pwm in controller._servos) if not MICROPYTHON else None
+    moves(WARMUP, motion, req, writer)
+    if MICROPYTHON:
+        ok = check_micropython(motion, req, writer)
+    else:
+        ok = check_cpython(controller, motion, req, writer)
+        if sum(pwm.writes for pwm in controller._servos) == writes:
+            print("No PWM writes: the moves never reached the servos")
+            ok = False
+    ok = check_histogram() and ok
+    applied = motion.mailbox.stats()['applied']
+    print(f"{applied} targets applied, {'PASS' if ok else 'FAIL'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
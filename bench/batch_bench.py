@@ -0,0 +1,84 @@
+"""
+Benchmark of repositioning every head: batched versus per-axis requests.
+
+Moves all four servos of the two pan/tilt heads to new angles, over and
+over, in three ways: one ``/batch`` request per servo (per axis), one
+``/move?h=..`` request per head, and a single ``/batch`` request for all
+four. Requests are sent back to back on one client, as a controlling
+app would, against a running server or one spawned on the simulated
+hardware with ``--spawn``:
+
+    python bench/batch_bench.py --spawn --count 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load  # noqa: E402
+
+
+def angles(i):
+    # Four servo angles that change on every repetition
+    return [(i * 7 + k * 40) % 181 for k in range(4)]
+
+
+def stick(angle):
+    # Joystick value in -100..100 that the server maps to about ``angle``
+    return min(max(round(angle * 100 / 90) - 100, -100), 100)
+
+
+def per_axis(i):
+    return [f'/batch?c{num}={angle}' for num, angle in enumerate(angles(i), 1)]
+
+
+def per_head(i):
+    a = angles(i)
+    return [f'/move?x={stick(a[0])}&y={stick(a[1])}&h=0', f'/move?x={stick(a[2])}&y={stick(a[3])}&h=1']
+
+
+def batch(i):
+    return ['/batch?' + '&'.join(f'c{num}={angle}' for num, angle in enumerate(angles(i), 1))]
+
+
+async def run(host, port, paths, count):
+    times = []
+    requests = 0
+    for i in range(count):
+        start = time.perf_counter()
+        for path in paths(i):
+            status, _ = await load.http_get(host, port, path)
+            if status != 200:
+                raise RuntimeError(f'{path} answered {status}')
+            requests += 1
+        times.append(time.perf_counter() - start)
+    return times, requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--spawn', action='store_true', help='start sim/run.py on --port first')
+    parser.add_argument('--count', type=int, default=300, help='repositions per mode')
+    args = parser.parse_args()
+
+    proc = load.spawn_server(args.port) if args.spawn else None
+    try:
+        print(f"{'mode':<10} {'requests':>8} {'per reposition ms: p50':>23} {'p95':>7} {'max':>7} {'repositions/s':>14}")
+        for label, paths in (('per axis', per_axis), ('per head', per_head), ('batch', batch)):
+            times, requests = asyncio.run(run(args.host, args.port, paths, args.count))
+            print(f"{label:<10} {requests:>8} {load.percentile(times, 50) * 1000:>23.3f} "
+                  f"{load.percentile(times, 95) * 1000:>7.3f} {max(times) * 1000:>7.3f} "
+                  f"{len(times) / sum(times):>14.1f}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
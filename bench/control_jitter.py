@@ -0,0 +1,62 @@
+"""
+Measure motion control-loop jitter with and without network load.
+
+Spawns the simulated server twice, once with the motion engine on a
+timer and once with ``--dual-core`` (its own thread, the same code that
+runs on the RP2040's second core). For each, the ``control_jitter``
+histogram (deviation of tick intervals from the 20 ms period) is read
+after an idle phase and again after a phase of concurrent /move load:
+
+    python bench/control_jitter.py --clients 8 --duration 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load  # noqa: E402
+
+
+async def jitter(port):
+    # Report and clear the histograms
+    status, body = await load.http_get('127.0.0.1', port, '/metrics?reset=1')
+    return json.loads(body)['timers_us']['control_jitter']
+
+
+async def measure(port, clients, duration):
+    await jitter(port)
+    await asyncio.sleep(duration)
+    idle = await jitter(port)
+    args = argparse.Namespace(host='127.0.0.1', port=port, mode='http',
+                              clients=clients, duration=duration)
+    result, _ = await load.run(args)
+    loaded = await jitter(port)
+    return idle, loaded, result['rps']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per phase')
+    args = parser.parse_args()
+
+    print(f"{'engine':<10} {'phase':<6} {'ticks':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}  (us)")
+    for label, options in (('timer', ()), ('dual-core', ('--dual-core',))):
+        proc = load.spawn_server(args.port, *options)
+        try:
+            idle, loaded, rps = asyncio.run(measure(args.port, args.clients, args.duration))
+        finally:
+            proc.terminate()
+            proc.wait()
+        for phase, stats in (('idle', idle), ('load', loaded)):
+            print(f"{label:<10} {phase:<6} {stats['count']:>6} {stats['p50']:>7} {stats['p95']:>7} "
+                  f"{stats['p99']:>7} {stats['max']:>7}")
+        print(f"{'':<10} load: {rps} moves/s from {args.clients} clients")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+Load-test the joystick server with concurrent /move clients.
+
+Drives ``/move`` over HTTP (one connection per request, as the page's
+fetch() fallback does) or over the ``/ws`` WebSocket channel, then
+reports throughput, latency percentiles and how many of the sent
+commands the server applied versus dropped as stale or superseded. The
+target is either an already running server or one spawned on the
+simulated hardware with ``--spawn``:
+
+    python bench/load.py --spawn --clients 8 --duration 5
+    python bench/load.py --mode ws --spawn --clients 4
+    python bench/load.py --host 192.168.1.50 --port 80 --clients 2
+
+Thresholds (``--min-rps``, ``--max-p95-ms``) make it usable as a
+regression gate: the exit status is 1 when one is missed.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(len(ordered) * p / 100) - 1))]
+
+
+class Sequence:
+    # One logical joystick stream shared by every client
+    def __init__(self):
+        self.value = 0
+
+    def next(self):
+        self.value = (self.value + 1) & 0xFFFF
+        return self.value
+
+
+def stick(step):
+    # A smooth circular sweep of the stick, in -100..100
+    angle = step / 25
+    return int(math.cos(angle) * 80), int(math.sin(angle) * 80)
+
+
+async def http_get(host, port, path, timeout=5.0):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(f'GET {path} HTTP/1.0\r\nHost: {host}\r\n\r\n'.encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    return status, body
+
+
+async def fetch_commands(host, port):
+    try:
+        status, body = await http_get(host, port, '/metrics')
+        return json.loads(body).get('commands', {}) if status == 200 else {}
+    except (OSError, ValueError, asyncio.TimeoutError):
+        return {}
+
+
+async def http_client(host, port, deadline, seq, latencies, errors):
+    step = 0
+    while time.perf_counter() < deadline:
+        x, y = stick(step)
+        step += 1
+        start = time.perf_counter()
+        try:
+            status, _ = await http_get(host, port, f'/move?x={x}&y={y}&s={seq.next()}')
+            if status != 200:
+                errors.append(status)
+                continue
+        except (OSError, asyncio.TimeoutError, IndexError, ValueError) as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def ws_frame(opcode, payload):
+    mask = os.urandom(4)
+    masked = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+    return bytes((0x80 | opcode, 0x80 | len(payload))) + mask + masked
+
+
+async def ws_client(host, port, deadline, seq, latencies, errors):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16))
+        writer.write(b'GET /ws HTTP/1.1\r\nHost: %s\r\nUpgrade: websocket\r\n'
+                     b'Connection: Upgrade\r\nSec-WebSocket-Key: %s\r\n'
+                     b'Sec-WebSocket-Version: 13\r\n\r\n' % (host.encode(), key))
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 5)
+        if b' 101 ' not in head.split(b'\r\n', 1)[0]:
+            errors.append('handshake')
+            return
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        errors.append(type(e).__name__)
+        return
+    step = 0
+    try:
+        while time.perf_counter() < deadline:
+            x, y = stick(step)
+            step += 1
+            start = time.perf_counter()
+            # The server acknowledges each sequenced move, giving a round trip
+            writer.write(ws_frame(0x1, f'{x},{y},{seq.next()}'.encode()))
+            await writer.drain()
+            header = await asyncio.wait_for(reader.readexactly(2), 5)
+            await reader.readexactly(header[1] & 0x7F)
+            if header[0] & 0x0F != 0x1:
+                errors.append('ack')
+                break
+            latencies.append(time.perf_counter() - start)
+        writer.write(ws_frame(0x8, b'\x03\xe8'))
+        await writer.drain()
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        errors.append(type(e).__name__)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    before = await fetch_commands(args.host, args.port)
+    seq = Sequence()
+    latencies = []
+    errors = []
+    client = ws_client if args.mode == 'ws' else http_client
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(client(args.host, args.port, deadline, seq, latencies, errors)
+                           for _ in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.1)  # Let the engine collect the last pending targets
+    after = await fetch_commands(args.host, args.port)
+
+    # Every /move carries one target per axis
+    sent = len(latencies) * 2
+    result = {
+        'mode': args.mode,
+        'clients': args.clients,
+        'duration_s': round(elapsed, 3),
+        'moves': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 3),
+            'p95': round(percentile(latencies, 95) * 1000, 3),
+            'p99': round(percentile(latencies, 99) * 1000, 3),
+            'max': round(max(latencies, default=0) * 1000, 3),
+        },
+        'axis_targets_sent': sent,
+    }
+    for name in ('received', 'applied', 'dropped'):
+        if name in after:
+            result['axis_targets_' + name] = after[name] - before.get(name, 0)
+    return result, errors
+
+
+def spawn_server(port, *options):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'sim', 'run.py'), '--port', str(port)]
+                            + list(options),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            asyncio.run(http_get('127.0.0.1', port, '/metrics', timeout=0.5))
+            return proc
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError('Simulated server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--spawn', action='store_true', help='start sim/run.py on --port first')
+    parser.add_argument('--mode', choices=('http', 'ws'), default='http')
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds (default 5)')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    parser.add_argument('--min-rps', type=float, help='fail below this many moves per second')
+    parser.add_argument('--max-p95-ms', type=float, help='fail above this p95 latency')
+    args = parser.parse_args()
+
+    proc = spawn_server(args.port) if args.spawn else None
+    try:
+        result, errors = asyncio.run(run(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        latency = result['latency_ms']
+        print(f"{result['mode']}: {result['clients']} clients, {result['duration_s']} s")
+        print(f"  moves      {result['moves']} ({result['rps']}/s), errors {result['errors']}")
+        print(f"  latency ms p50 {latency['p50']}  p95 {latency['p95']}  "
+              f"p99 {latency['p99']}  max {latency['max']}")
+        if 'axis_targets_applied' in result:
+            print(f"  axis targets sent {result['axis_targets_sent']}, received "
+                  f"{result['axis_targets_received']}, applied {result['axis_targets_applied']}, "
+                  f"dropped {result['axis_targets_dropped']}")
+        if errors:
+            print(f"  first errors: {errors[:5]}")
+
+    failed = False
+    if args.min_rps is not None and result['rps'] < args.min_rps:
+        print(f"FAIL: {result['rps']} moves/s is below {args.min_rps}")
+        failed = True
+    if args.max_p95_ms is not None and result['latency_ms']['p95'] > args.max_p95_ms:
+        print(f"FAIL: p95 {result['latency_ms']['p95']} ms is above {args.max_p95_ms}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of the cost of logging on the caller's path.
+
+Compares a formatted ``print()`` per event, as the server used to do,
+with ``log.info()`` storing into the ring buffer, a message filtered out
+by the level, and a repeat that is only counted. Printing goes to a null
+sink, which flatters it: on the board the same line also has to cross
+the USB serial link, estimated here at 115200 baud. Run from the
+repository root:
+
+    python bench/log_bench.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'lib'))
+
+import log  # noqa: E402
+
+CALLS = 100000
+BAUD = 115200
+
+
+class NullWriter:
+    def write(self, text):
+        pass
+
+
+def cost(label, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / CALLS * 1e9:>10,.0f} ns/call")
+
+
+def main():
+    log.echo = False
+    hosts = [f'192.168.1.{i % 250}' for i in range(CALLS)]
+
+    def printed():
+        stdout, sys.stdout = sys.stdout, NullWriter()
+        try:
+            for host in hosts:
+                print(f"WebSocket client {host} connected")
+        finally:
+            sys.stdout = stdout
+
+    def stored():
+        for host in hosts:
+            log.info("WebSocket client %s connected", host)
+
+    def filtered():
+        for host in hosts:
+            log.debug("WebSocket client %s connected", host)
+
+    def repeated():
+        for _ in hosts:
+            log.info("Stopping servos")
+
+    cost("print() to a null sink", printed)
+    cost("log.info(), stored", stored)
+    cost("log.debug() below level", filtered)
+    cost("log.info(), repeat counted", repeated)
+    line = "WebSocket client 192.168.1.100 connected\n"
+    print(f"{'  + serial time for that print line':<40} {len(line) * 10 / BAUD * 1e9:>10,.0f} ns/call")
+    print(f"log stats: {log.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark of peak heap used while serving the web UI.
+
+Serves every file in ``www/`` to a writer that discards the bytes and
+reports the peak heap growth per request, beyond the cost of running
+the event loop and opening the file. It compares loading the whole file
+(as the old in-source page string was sent) with streaming it through
+the request buffer with ``send_static``. Allocation is measured
+with ``gc.mem_alloc()`` on MicroPython and ``tracemalloc`` on CPython.
+Run from the repository root:
+
+    python bench/page_heap.py
+"""
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim  # noqa: E402
+
+sim.install()
+
+import web_joystick  # noqa: E402
+from httpreq import Request  # noqa: E402
+
+
+class NullWriter:
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+
+    async def drain(self):
+        pass
+
+
+def request(path, gzip):
+    req = Request(web_joystick.REQUEST_SIZE)
+    head = b'GET %s HTTP/1.1\r\nHost: pico\r\n%s\r\n' % (path, b'Accept-Encoding: gzip\r\n' if gzip else b'')
+    req.buf[:len(head)] = head
+    req.length = len(head)
+    req.head_end = req._find_head_end(0)
+    req.parse()
+    return req
+
+
+async def open_only(req, writer, entry):
+    with open(entry[1], 'rb'):
+        pass
+
+
+async def send_whole(req, writer, entry):
+    with open(entry[1], 'rb') as f:
+        body = f.read()
+    web_joystick.send_response(writer, b'200 OK', body, entry[2])
+    await web_joystick.drain(writer)  # As handle_client does after every handler
+
+
+def peak_heap(func):
+    # Peak bytes allocated while func() runs
+    try:
+        import gc
+        gc.mem_alloc
+    except AttributeError:
+        import tracemalloc
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak - before
+    gc.collect()
+    gc.disable()
+    before = gc.mem_alloc()
+    func()
+    used = gc.mem_alloc() - before
+    gc.enable()
+    return used
+
+
+def main():
+    web_joystick.STATIC_DIR = os.path.join(ROOT, 'www')
+    web_joystick.scan_static()
+    loop = asyncio.new_event_loop()
+    print(f"{'file':<18} {'bytes':>6} {'whole':>7} {'streamed':>9}  (peak heap bytes)")
+    worst = 0
+    for entry in web_joystick.STATIC:
+        if entry[0] == b'/':
+            continue
+        for gzip in (False, True):
+            if gzip and entry[5] is None:
+                continue
+            req = request(entry[0], gzip)
+
+            def peak(send):
+                return peak_heap(lambda: loop.run_until_complete(send(req, NullWriter(), entry)))
+
+            base = peak(open_only)
+            whole = peak(send_whole) - base
+            streamed = peak(web_joystick.send_static) - base
+            worst = max(worst, streamed)
+            label = entry[0].decode() + (' (gz)' if gzip else '')
+            print(f"{label:<18} {entry[5] if gzip else entry[3]:>6} {whole:>7} {streamed:>9}")
+    print(f"Worst streamed peak {worst} bytes with STATIC_CHUNK {web_joystick.STATIC_CHUNK}")
+
+
+if __name__ == '__main__':
+    main()
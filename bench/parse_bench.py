@@ -0,0 +1,97 @@
+"""
+Benchmark for /move request parsing.
+
+Compares the original decode-and-split parsing with the buffer-scanning
+``httpreq.Request`` on a typical browser request, reporting parse rate
+and bytes allocated per request. Allocation is measured with
+``gc.mem_alloc()`` on MicroPython and ``tracemalloc`` on CPython. Run
+from the repository root:
+
+    python bench/parse_bench.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim  # noqa: E402
+
+sim.install()
+
+from httpreq import Request  # noqa: E402
+
+REQUEST = (b'GET /move?y=-44&x=13 HTTP/1.1\r\n'
+           b'Host: 192.168.1.50\r\n'
+           b'User-Agent: Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101 Firefox/128.0\r\n'
+           b'Accept: */*\r\n'
+           b'Accept-Language: en-US,en;q=0.5\r\n'
+           b'Accept-Encoding: gzip, deflate\r\n'
+           b'Connection: keep-alive\r\n'
+           b'Referer: http://192.168.1.50/\r\n\r\n')
+CALLS = 20000
+
+
+def legacy_parse(raw):
+    # Parsing as done by the original blocking serve() loop
+    request = raw.decode('utf-8')
+    path = request.split(' ')[1]
+    params = path.split('?')[1].split('&')
+    x = int(params[0].split('=')[1])
+    y = int(params[1].split('=')[1])
+    return x, y
+
+
+def request_parse(req):
+    req.reset()
+    req.buf[:len(REQUEST)] = REQUEST
+    req.length = len(REQUEST)
+    req.head_end = req._find_head_end(0)
+    req.parse()
+    if req.path_is(b'/move'):
+        return req.param_int(b'x'), req.param_int(b'y')
+
+
+def allocated(func):
+    # Bytes allocated by one call of func()
+    try:
+        import gc
+        gc.mem_alloc
+    except AttributeError:
+        import tracemalloc
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak - before
+    gc.collect()
+    gc.disable()
+    before = gc.mem_alloc()
+    func()
+    used = gc.mem_alloc() - before
+    gc.enable()
+    return used
+
+
+def report(label, func):
+    func()  # Warm up
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {CALLS / elapsed:>10,.0f} req/s {allocated(func):>6} bytes/req")
+
+
+def main():
+    req = Request()
+    raw = bytes(REQUEST)
+    assert legacy_parse(b'GET /move?x=13&y=-44 HTTP/1.1\r\n\r\n') == request_parse(req) == (13, -44)
+    report("decode + split", lambda: legacy_parse(raw))
+    report("httpreq.Request", lambda: request_parse(req))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark for the ServoController write path.
+
+Compares the original ``servo()`` implementation (float maths, bounds
+checks and a formatted print per call) with the table-driven fast path,
+using the stand-in PWM from ``sim/machine.py``. Run from the repository
+root:
+
+    python bench/servo_bench.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim  # noqa: E402
+
+sim.install()
+
+from servocontrollerv2 import ServoController  # noqa: E402
+
+CALLS = 100000
+
+
+class NullWriter:
+    def write(self, text):
+        pass
+
+
+def legacy_servo(controller, num, angle, degrees=180):
+    # The write path as it was before the duty tables were introduced
+    if not 1 <= num <= len(controller._servos):
+        raise ValueError(f"Servo number must be between 1 and {len(controller._servos)}")
+    if not 0 <= angle <= degrees:
+        raise ValueError(f"Angle must be between 0 and {degrees}")
+    duty = int(((angle / degrees) * 8000) + 3000)
+    controller._servos[num - 1].duty_u16(duty)
+    print(f"Servo {num}: angle={angle}, duty={duty}")
+
+
+def rate(label, func, calls=CALLS, unit='calls/s'):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {calls / elapsed:>12,.0f} {unit}")
+
+
+def main():
+    controller = ServoController()
+    angles = [i % 181 for i in range(CALLS)]
+
+    def legacy():
+        stdout, sys.stdout = sys.stdout, NullWriter()  # Printing to a null sink flatters legacy
+        try:
+            for angle in angles:
+                legacy_servo(controller, 1, angle)
+        finally:
+            sys.stdout = stdout
+
+    def fast_changing():
+        for angle in angles:
+            controller.servo(1, angle)
+
+    def fast_unchanged():
+        for _ in angles:
+            controller.servo(1, 90)
+
+    def pan_tilt_pairs():
+        for angle in angles[::2]:
+            controller.servo(1, angle)
+            controller.servo(2, angle)
+
+    def pan_tilt_move_many():
+        for angle in angles[::2]:
+            controller.move_many({1: angle, 2: angle})
+
+    rate("legacy servo(), changing angle", legacy)
+    rate("servo(), changing angle", fast_changing)
+    writes = controller._servos[0].writes
+    rate("servo(), same angle (write skipped)", fast_unchanged)
+    print(f"{'  PWM writes for same-angle run':<40} {controller._servos[0].writes - writes:>12}")
+    rate("2x servo() per pan/tilt update", pan_tilt_pairs, CALLS // 2, 'updates/s')
+    rate("move_many() per pan/tilt update", pan_tilt_move_many, CALLS // 2, 'updates/s')
+
+
+if __name__ == '__main__':
+    main()
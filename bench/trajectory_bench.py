@@ -0,0 +1,145 @@
+"""
+Benchmark of trajectory recording memory and replay timing.
+
+Records a pan/tilt sweep that changes on every 20 ms motion tick (the
+worst case: still periods store nothing) and reports the bytes it takes
+per recorded second in the array-backed ``Trajectory`` against a list of
+(time, pan, tilt) tuples. It then replays a recording through a
+``Player`` and reports how late each sample was posted, idle and with a
+task that keeps the event loop busy the way request handling does.
+Allocation is measured with ``gc.mem_alloc()`` on MicroPython and
+``tracemalloc`` on CPython. Run from the repository root:
+
+    python bench/trajectory_bench.py --seconds 3
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim  # noqa: E402
+
+sim.install()
+
+import metrics  # noqa: E402
+from cmdmailbox import CommandMailbox  # noqa: E402
+from servocontrollerv2 import ServoController, MotionEngine  # noqa: E402
+from ticks import ticks_ms  # noqa: E402
+from trajectory import Trajectory, Player  # noqa: E402
+
+PERIOD_MS = 20
+
+
+def allocated(func):
+    # Bytes still allocated after func() returns, with its result kept alive
+    try:
+        import gc
+        gc.mem_alloc
+    except AttributeError:
+        import tracemalloc
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        result = func()
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        return used, result
+    gc.collect()
+    before = gc.mem_alloc()
+    result = func()
+    gc.collect()
+    return gc.mem_alloc() - before, result
+
+
+def sweep(i):
+    # Pan and tilt angles of a slow figure of eight
+    return 90 + 60 * math.sin(i / 50), 90 + 30 * math.sin(i / 25)
+
+
+class FakeController:
+    def __init__(self):
+        self.angles = [90.0, 90.0]
+
+    def angle(self, num):
+        return self.angles[num - 1]
+
+    def centidegrees(self, num):
+        return int(self.angles[num - 1] * 100 + 0.5)
+
+
+def record_arrays(samples):
+    traj = Trajectory((1, 2), samples)
+    controller = FakeController()
+    traj.start()
+    for i in range(samples):
+        controller.angles[0], controller.angles[1] = sweep(i)
+        traj.sample(controller)
+    for i in range(traj.count):
+        traj.times[i] = i * PERIOD_MS  # As if sampled by real 20 ms ticks
+    return traj
+
+
+def record_tuples(samples):
+    recording = []
+    for i in range(samples):
+        pan, tilt = sweep(i)
+        recording.append((i * PERIOD_MS, pan, tilt))
+    return recording
+
+
+async def busy_loop(stop):
+    # Blocks the loop for ~2 ms at a time, like parsing and answering requests
+    while not stop:
+        end = time.perf_counter() + 0.002
+        while time.perf_counter() < end:
+            pass
+        await asyncio.sleep(0.005)
+
+
+async def replay(traj, busy):
+    motion = MotionEngine(ServoController(), mailbox=CommandMailbox(4))
+    task = asyncio.create_task(motion.run())
+    stop = []
+    hog = asyncio.create_task(busy_loop(stop)) if busy else None
+    player = Player(motion)
+    metrics.timers['replay_jitter'].reset()
+    start = ticks_ms()
+    player.start('bench', traj)
+    while player.running():
+        await asyncio.sleep(0.05)
+    elapsed = ticks_ms() - start
+    stop.append(True)
+    task.cancel()
+    if hog is not None:
+        await hog
+    return elapsed, player.progress(), metrics.timers['replay_jitter'].summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=3.0, help='length of the sweep')
+    args = parser.parse_args()
+    samples = int(args.seconds * 1000 / PERIOD_MS)
+
+    array_bytes, traj = allocated(lambda: record_arrays(samples))
+    tuple_bytes, _ = allocated(lambda: record_tuples(samples))
+    print(f"Recording {samples} samples ({args.seconds} s at {1000 // PERIOD_MS} Hz)")
+    print(f"  array('I') + array('H')  {array_bytes / args.seconds:>8,.0f} bytes/s "
+          f"({traj.nbytes() / args.seconds:,.0f} bytes/s of samples)")
+    print(f"  list of tuples           {tuple_bytes / args.seconds:>8,.0f} bytes/s")
+
+    print("Replay (lateness of posted samples)")
+    for busy in (False, True):
+        elapsed, progress, jitter = asyncio.run(replay(traj, busy))
+        label = 'busy loop' if busy else 'idle'
+        print(f"  {label:<10} {elapsed:>5} ms for {traj.duration_ms()} ms recorded, "
+              f"skipped {progress['skipped']}, late p50 {jitter['p50'] / 1000:.1f} ms "
+              f"p95 {jitter['p95'] / 1000:.1f} ms max {jitter['max'] / 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+One-to-many publishing of a shared, pre-formatted message.
+
+The producer formats a message once and publishes it; every subscriber
+wakes up and writes those same bytes to its own connection. A subscriber
+that falls behind simply skips to the newest message, so a slow viewer
+never holds up the producer or the other viewers.
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+
+class Broadcast:
+    def __init__(self):
+        """
+        Create a broadcast with no message and no subscribers.
+        """
+        self.message = b''
+        self.subscribers = 0
+        self.published = 0
+        self._event = asyncio.Event()
+
+    def publish(self, message):
+        """
+        Replace the current message and wake every waiting subscriber.
+
+        Args:
+            message (bytes): Complete, ready-to-send message.
+        """
+        self.message = message
+        self.published += 1
+        self._event.set()
+        self._event.clear()
+
+    async def wait(self):
+        """
+        Wait for the next message.
+
+        Returns:
+            bytes: The message published after the call.
+        """
+        await self._event.wait()
+        return self.message
+
+    def stats(self):
+        """
+        Get the subscriber count, messages published and last message size.
+        """
+        return {
+            'subscribers': self.subscribers,
+            'published': self.published,
+            'message_bytes': len(self.message),
+        }
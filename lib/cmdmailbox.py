@@ -0,0 +1,200 @@
+"""
+Latest-wins command mailbox between the network and the motion engine.
+
+The network side posts target angles as fast as clients send them; the
+motion engine collects them once per tick. Each channel holds at most one
+pending target, so a burst of joystick moves collapses into the newest
+one instead of being replayed in order.
+
+When the engine runs on another core, give the mailbox a lock: the slots
+are then only touched under the lock, and stops are handed to the
+engine's next tick instead of writing the PWM from the network core.
+
+Client sequence numbers are checked per client with :class:`SeqFilter`
+before anything is posted: every controller counts on its own, so two
+of them steering at once must not make each other's moves look stale.
+"""
+from ticks import ticks_ms, ticks_diff
+
+SEQ_MASK = 0xFFFF
+SEQ_HALF = 0x8000
+SEQ_RESET_MS = 1000  # After this much silence any sequence number is accepted
+
+
+class _NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False  # Explicit arguments: *exc would allocate a tuple per call
+
+
+class SeqFilter:
+    def __init__(self):
+        """
+        Track the newest sequence number seen from one client.
+        """
+        self.seq = 0
+        self.ms = None  # ticks_ms() of the last accepted number
+
+    def accept(self, seq):
+        """
+        Check that a client's move is newer than its last one.
+
+        Any number is accepted again after ``SEQ_RESET_MS`` of silence, so
+        a client that restarts its counter is not locked out.
+
+        Args:
+            seq (int): Client sequence number (16-bit, wrapping).
+
+        Returns:
+            bool: False if the move arrived out of order or twice.
+        """
+        now = ticks_ms()
+        if self.ms is not None and ticks_diff(now, self.ms) < SEQ_RESET_MS:
+            delta = (seq - self.seq) & SEQ_MASK
+            if delta == 0 or delta >= SEQ_HALF:
+                return False
+        self.seq = seq & SEQ_MASK
+        self.ms = now
+        return True
+
+
+class CommandMailbox:
+    def __init__(self, channels, degrees=180, lock=None):
+        """
+        Create a mailbox with one slot per servo channel.
+
+        Args:
+            channels (int): Number of servo channels.
+            degrees (int): Maximum degrees of rotation (default 180).
+            lock (optional): ``_thread`` lock, when the motion engine ticks
+                on another core or thread.
+        """
+        self.degrees = degrees
+        self.threaded = lock is not None
+        self._lock = lock if lock is not None else _NoLock()
+        self._stop_pending = False
+        self._target = [0] * channels
+        self._pending = [False] * channels
+        self.received = 0
+        self.applied = 0
+        self.dropped = 0
+        self.stops = 0
+
+    def post(self, num, angle):
+        """
+        Offer a new target angle for a servo.
+
+        A pending move that has not been applied yet is replaced and
+        counted as dropped.
+
+        Args:
+            num (int): Servo number (1-indexed).
+            angle (int): Target angle.
+
+        Raises:
+            ValueError: If servo number or angle is out of bounds.
+        """
+        self.check(num, angle)
+        with self._lock:
+            self._offer(num - 1, angle)
+
+    def post_many(self, targets):
+        """
+        Offer new target angles for several servos at once.
+
+        Every target is validated before any is posted, and all of them are
+        posted under one lock, so the engine picks them up in the same tick.
+
+        Args:
+            targets: Sequence of (servo number, angle) pairs.
+
+        Raises:
+            ValueError: If a servo number or angle is out of bounds.
+        """
+        for num, angle in targets:
+            self.check(num, angle)
+        with self._lock:
+            for num, angle in targets:
+                self._offer(num - 1, angle)
+
+    def reject(self, count=1):
+        """
+        Count targets a client's sequence check dropped before posting.
+        """
+        with self._lock:
+            self.received += count
+            self.dropped += count
+
+    def check(self, num, angle):
+        """
+        Validate a target without posting it.
+
+        Raises:
+            ValueError: If servo number or angle is out of bounds.
+        """
+        if not 1 <= num <= len(self._target):
+            raise ValueError(f"Servo number must be between 1 and {len(self._target)}")
+        if not 0 <= angle <= self.degrees:
+            raise ValueError(f"Angle must be between 0 and {self.degrees}")
+
+    def _offer(self, i, angle):
+        # Called with the lock held
+        self.received += 1
+        if self._pending[i]:
+            self.dropped += 1  # Superseded before the engine picked it up
+        self._target[i] = angle
+        self._pending[i] = True
+
+    def apply(self, motion):
+        """
+        Hand a deferred stop and every pending target to the motion engine.
+
+        Args:
+            motion (MotionEngine): Engine to retarget.
+        """
+        with self._lock:
+            if self._stop_pending:
+                self._stop_pending = False
+                motion.release()
+            for i in range(len(self._pending)):
+                if self._pending[i]:
+                    self._pending[i] = False
+                    motion.move_to(i + 1, self._target[i])
+                    self.applied += 1
+
+    def stop(self, motion):
+        """
+        Discard pending moves and stop and release the servos.
+
+        Single-threaded, the servos are released immediately; with a lock
+        the release happens at the start of the engine's next tick.
+
+        Args:
+            motion (MotionEngine): Engine to stop.
+        """
+        with self._lock:
+            for i in range(len(self._pending)):
+                if self._pending[i]:
+                    self._pending[i] = False
+                    self.dropped += 1
+            self.stops += 1
+            if self.threaded:
+                self._stop_pending = True
+                return
+        motion.release()
+
+    def stats(self):
+        """
+        Get the command counters.
+
+        Returns:
+            dict: Counts of received, applied, dropped and stop commands.
+        """
+        return {
+            'received': self.received,
+            'applied': self.applied,
+            'dropped': self.dropped,
+            'stops': self.stops,
+        }
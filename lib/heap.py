@@ -0,0 +1,173 @@
+"""
+Garbage collection scheduling and heap monitoring.
+
+MicroPython collects whenever an allocation fails or, with a threshold
+set, once that many bytes were allocated since the last collection; the
+pause lands on whatever happened to allocate, often a request or a
+motion tick. :func:`setup` sets the threshold high enough that this is
+rare, and :func:`run` collects at idle points instead, timing every
+collection. After an idle collection the largest free block is measured
+now and then, since a fragmented heap can fail a large allocation while
+plenty of memory is free in total.
+
+On CPython, which reports no heap figures, the collector's own runs are
+timed through ``gc.callbacks`` instead, so the simulator still shows
+the pauses.
+"""
+import gc
+
+from ticks import ticks_ms, ticks_us, ticks_diff
+
+import metrics
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+CHECK_MS = 250  # How often run() looks for an idle moment
+IDLE_BYTES = 8192  # Allocation since the last collection worth collecting at idle
+PROBE_MS = 60000  # Minimum interval between largest-free-block measurements
+
+_gc_timer = metrics.timers['gc']
+
+collections = 0  # Collections started by this module
+pause_us = 0  # Duration of the last one
+auto_collections = 0  # Collections the runtime started on its own (CPython only)
+auto_pause_us_max = 0
+largest_free = None  # Largest allocatable block after the last probe, in bytes
+_allocated = 0  # mem_alloc() right after the last collection
+_probed = None
+_collecting = False
+_auto_start = 0
+
+
+def _on_gc(phase, info):
+    global auto_collections, auto_pause_us_max, _auto_start
+    if _collecting:
+        return  # Timed by collect()
+    if phase == 'start':
+        _auto_start = ticks_us()
+        return
+    pause = ticks_diff(ticks_us(), _auto_start)
+    _gc_timer.record(pause)
+    auto_collections += 1
+    if pause > auto_pause_us_max:
+        auto_pause_us_max = pause
+
+
+def setup(fraction=4):
+    """
+    Collect once and set the automatic collection threshold.
+
+    Args:
+        fraction (int): Let the free heap shrink by 1/``fraction`` before
+            MicroPython collects on its own.
+    """
+    global _allocated
+    collect()
+    threshold = getattr(gc, 'threshold', None)
+    if threshold is not None:
+        threshold(gc.mem_free() // fraction + gc.mem_alloc())
+    callbacks = getattr(gc, 'callbacks', None)
+    if callbacks is not None and _on_gc not in callbacks:
+        callbacks.append(_on_gc)
+    _allocated = metrics.mem_alloc() or 0
+
+
+def collect():
+    """
+    Run a timed garbage collection.
+
+    Returns:
+        int: The pause in microseconds.
+    """
+    global collections, pause_us, _allocated, _collecting
+    _collecting = True
+    start = ticks_us()
+    gc.collect()
+    pause_us = ticks_diff(ticks_us(), start)
+    _collecting = False
+    _gc_timer.record(pause_us)
+    collections += 1
+    _allocated = metrics.mem_alloc() or 0
+    return pause_us
+
+
+def probe_largest_free(limit=None):
+    """
+    Find the largest block the heap can allocate, by bisection.
+
+    Every failed attempt makes MicroPython collect, so only call this at
+    an idle moment.
+
+    Args:
+        limit (int, optional): Upper bound; the free heap by default.
+
+    Returns:
+        int: Size in bytes (to within 16), or None where the runtime does
+            not report its heap.
+    """
+    global largest_free
+    free = metrics.mem_free() if limit is None else limit
+    if free is None:
+        return None
+    low, high = 0, free
+    while high - low > 16:
+        size = (low + high) // 2
+        try:
+            bytearray(size)
+            low = size
+        except MemoryError:
+            high = size
+    largest_free = low
+    return low
+
+
+async def run(is_idle, check_ms=CHECK_MS):
+    """
+    Collect whenever the program is idle and has allocated ``IDLE_BYTES``
+    since the last collection, until cancelled.
+
+    Args:
+        is_idle: Zero-argument callable, True when a pause would not
+            delay anything time-critical.
+        check_ms (int): Interval between checks.
+    """
+    global _probed
+    while True:
+        await asyncio.sleep(check_ms / 1000)
+        allocated = metrics.mem_alloc()
+        if allocated is None or allocated - _allocated < IDLE_BYTES or not is_idle():
+            continue
+        collect()
+        if _probed is None or ticks_diff(ticks_ms(), _probed) >= PROBE_MS:
+            probe_largest_free()
+            collect()  # Free the probe blocks at once
+            _probed = ticks_ms()
+
+
+def stats():
+    """
+    Get the collection count and pause, and the heap state.
+
+    Returns:
+        dict: Collections run here and by the runtime, pauses in
+            microseconds, free and allocated bytes, and the largest free
+            block with the share of free memory outside it
+            (fragmentation, 0-100).
+    """
+    free = metrics.mem_free()
+    fragmentation = None
+    if free and largest_free is not None:
+        fragmentation = max(0, 100 - largest_free * 100 // free)
+    return {
+        'collections': collections,
+        'pause_us': pause_us,
+        'auto_collections': auto_collections,
+        'auto_pause_us_max': auto_pause_us_max,
+        'mem_free': free,
+        'mem_alloc': metrics.mem_alloc(),
+        'largest_free': largest_free,
+        'fragmentation': fragmentation,
+    }
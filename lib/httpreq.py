@@ -0,0 +1,246 @@
+"""
+Allocation-free HTTP request parsing.
+
+A Request owns a preallocated buffer that the request head is read into
+with ``readinto``. The method, path, query string and headers are located
+by scanning the buffer and kept as index spans, so matching a route and
+reading integer query parameters creates no intermediate strings.
+"""
+
+_SPACE = 0x20
+_CR = 0x0D
+_AMPERSAND = 0x26
+_EQUALS = 0x3D
+_COLON = 0x3A
+_MINUS = 0x2D
+_ZERO = 0x30
+_NINE = 0x39
+_UPPER_A = 0x41
+_UPPER_Z = 0x5A
+_METHOD_MAX = 7  # Longest method name (OPTIONS)
+
+
+class Request:
+    def __init__(self, size=1024):
+        """
+        Create a reusable request buffer.
+
+        Args:
+            size (int): Maximum size of the request line plus headers.
+        """
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the previous request so the buffer can be reused.
+        """
+        self.length = 0
+        self.head_end = 0
+        self.method_end = 0
+        self.path_start = 0
+        self.path_end = 0
+        self.query_end = 0
+        self.headers_start = 0
+
+    async def read(self, reader):
+        """
+        Read the request head (request line and headers) into the buffer.
+
+        Args:
+            reader: asyncio stream reader of the client connection.
+
+        Returns:
+            bool: True if a complete head was read, False if the client
+                closed early, the head does not fit in the buffer or the
+                first bytes are not an HTTP method (e.g. a TLS handshake),
+                which is noticed without waiting for the rest.
+                Call :meth:`parse` next.
+        """
+        readinto = getattr(reader, 'readinto', None)
+        size = len(self.buf)
+        scanned = 0
+        while self.length < size:
+            if readinto is not None:
+                n = await readinto(self.mv[self.length:])
+            else:
+                # CPython's StreamReader has no readinto()
+                data = await reader.read(size - self.length)
+                n = len(data)
+                self.mv[self.length:self.length + n] = data
+            if not n:
+                return False
+            self.length += n
+            if not scanned and not self._method_ok():
+                return False
+            end = self._find_head_end(max(scanned - 3, 0))
+            if end:
+                self.head_end = end
+                return True
+            scanned = self.length
+        return False
+
+    def _method_ok(self):
+        # The bytes so far could start "METHOD "; checked once per request
+        buf = self.buf
+        if not _UPPER_A <= buf[0] <= _UPPER_Z:
+            return False
+        if self.length <= _METHOD_MAX:
+            return True
+        return buf.find(b' ', 1, _METHOD_MAX + 1) > 0
+
+    def _find_head_end(self, start):
+        end = self.buf.find(b'\r\n\r\n', start, self.length)
+        return end + 4 if end >= 0 else 0
+
+    def parse(self):
+        """
+        Locate the method, path and query string of the request line.
+
+        Returns:
+            bool: True if the request line is well formed.
+        """
+        buf = self.buf
+        end = self.head_end
+        space = buf.find(b' ', 0, end)
+        if space < 0:
+            return False
+        self.method_end = space
+        self.path_start = space + 1
+        line_end = buf.find(b'\r', space, end)
+        if line_end < 0:
+            line_end = end
+        space = buf.find(b' ', self.path_start, line_end)
+        if space < 0:
+            return False  # No HTTP version: malformed request line
+        self.query_end = space
+        question = buf.find(b'?', self.path_start, space)
+        self.path_end = question if question >= 0 else space
+        self.headers_start = buf.find(b'\n', space, end) + 1 or end
+        return self.path_start < self.path_end
+
+    def _equals(self, start, end, value):
+        # find() compares in C; anchored at start with the same length it is ==
+        return end - start == len(value) and self.buf.find(value, start, end) == start
+
+    def method_is(self, method):
+        """
+        Check the request method, e.g. ``req.method_is(b'GET')``.
+        """
+        return self._equals(0, self.method_end, method)
+
+    def path_is(self, path):
+        """
+        Check the path (without query string), e.g. ``req.path_is(b'/move')``.
+        """
+        return self._equals(self.path_start, self.path_end, path)
+
+    def path(self):
+        """
+        Get the path as a memoryview into the buffer.
+        """
+        return self.mv[self.path_start:self.path_end]
+
+    def _find_param(self, name):
+        # Index of the value of query parameter ``name``, or -1
+        buf = self.buf
+        i = self.path_end + 1
+        end = self.query_end
+        count = len(name)
+        while i < end:
+            separator = buf.find(b'&', i, end)
+            if separator < 0:
+                separator = end
+            equals = i + count
+            if equals < separator and buf[equals] == _EQUALS and buf.find(name, i, equals) == i:
+                return equals + 1
+            i = separator + 1
+        return -1
+
+    def param(self, name):
+        """
+        Get a query parameter value as bytes.
+
+        Args:
+            name (bytes): Parameter name, e.g. b'format'.
+
+        Returns:
+            bytes: The raw (not percent-decoded) value, or None if absent.
+        """
+        i = self._find_param(name)
+        if i < 0:
+            return None
+        end = self.buf.find(b'&', i, self.query_end)
+        if end < 0:
+            end = self.query_end
+        return bytes(self.mv[i:end])
+
+    def param_int(self, name, default=None):
+        """
+        Read an integer query parameter, in any position of the query string.
+
+        Args:
+            name (bytes): Parameter name, e.g. b'x'.
+            default: Value returned if the parameter is missing or malformed.
+
+        Returns:
+            int: The parsed value, or ``default``.
+        """
+        i = self._find_param(name)
+        if i < 0:
+            return default
+        buf = self.buf
+        end = self.query_end
+        negative = i < end and buf[i] == _MINUS
+        if negative:
+            i += 1
+        value = 0
+        digits = 0
+        while i < end and _ZERO <= buf[i] <= _NINE:
+            value = value * 10 + buf[i] - _ZERO
+            digits += 1
+            i += 1
+        if not digits or (i < end and buf[i] != _AMPERSAND):
+            return default
+        return -value if negative else value
+
+    def header(self, name):
+        """
+        Get a header value as bytes.
+
+        Args:
+            name (bytes): Lower-case header name, e.g. b'sec-websocket-key'.
+
+        Returns:
+            bytes: The stripped header value, or None if the header is absent.
+        """
+        buf = self.buf
+        i = self.headers_start
+        end = self.head_end
+        count = len(name)
+        while i < end:
+            line_end = buf.find(b'\n', i, end)
+            if line_end < 0:
+                line_end = end
+            # Only a line with the colon in the right place can match; just
+            # those few are compared, case-insensitively, byte by byte
+            if i + count < line_end and buf[i + count] == _COLON:
+                j = 0
+                while j < count:
+                    c = buf[i + j]
+                    if _UPPER_A <= c <= _UPPER_Z:
+                        c |= 0x20  # Header names are case-insensitive
+                    if c != name[j]:
+                        break
+                    j += 1
+                if j == count:
+                    start = i + count + 1
+                    stop = line_end
+                    while start < stop and buf[start] == _SPACE:
+                        start += 1
+                    while stop > start and buf[stop - 1] in (_CR, _SPACE):
+                        stop -= 1
+                    return bytes(self.mv[start:stop])
+            i = line_end + 1
+        return None
@@ -0,0 +1,175 @@
+"""
+Leveled logging into a fixed-size ring buffer.
+
+Logging a message stores a reference to its format string and arguments
+in a preallocated slot; nothing is formatted or printed on the caller's
+path. :func:`run` prints new entries to the console from a background
+task, so a slow USB serial link delays the log instead of the request,
+and ``/logs`` reads the same buffer. Messages below ``level`` cost a
+single comparison.
+
+The same message and arguments logged again within ``REPEAT_MS`` of
+the previous entry are counted instead of stored, and summarised by a
+"repeated N times" entry when something else is logged.
+"""
+from array import array
+
+from ticks import ticks_ms, ticks_diff
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+SIZE = 64  # Entries kept; older ones are overwritten
+REPEAT_MS = 1000  # Window in which a repeated message is only counted
+FLUSH_MS = 200  # Console flush interval of run()
+
+level = INFO
+echo = True  # Print entries to the console
+
+_times = array('I', [0] * SIZE)
+_levels = bytearray(SIZE)
+_messages = [None] * SIZE
+_args = [None] * SIZE
+_next = 0  # Id of the next entry; entry i lives in slot i % SIZE
+_printed = 0  # Id of the first entry not yet printed
+_last = None  # Format string of the newest entry, for repeat detection
+_last_args = None  # and its arguments
+_repeats = 0
+suppressed = 0  # Repeats counted instead of stored
+dropped = 0  # Entries overwritten before they were printed
+
+
+def _store(lvl, msg, args):
+    global _next, _printed, dropped
+    i = _next % SIZE
+    _times[i] = ticks_ms()
+    _levels[i] = lvl
+    _messages[i] = msg
+    _args[i] = args
+    _next += 1
+    if echo and _next - _printed > SIZE:
+        dropped += 1
+        _printed = _next - SIZE
+
+
+def log(lvl, msg, *args):
+    """
+    Record a message if ``lvl`` is at or above ``level``.
+
+    Args:
+        lvl (int): One of DEBUG, INFO, WARNING or ERROR.
+        msg (str): Message, or a ``%`` format string for ``args``.
+        *args: Values formatted into ``msg`` only when it is read.
+    """
+    global _last, _last_args, _repeats, suppressed
+    if lvl < level:
+        return
+    if (msg is _last and args == _last_args
+            and ticks_diff(ticks_ms(), _times[(_next - 1) % SIZE]) < REPEAT_MS):
+        _repeats += 1
+        suppressed += 1
+        return
+    if _repeats:
+        _store(_levels[(_next - 1) % SIZE], 'Last message repeated %d times', (_repeats,))
+        _repeats = 0
+    _last = msg
+    _last_args = args
+    _store(lvl, msg, args)
+
+
+def debug(msg, *args):
+    if DEBUG >= level:
+        log(DEBUG, msg, *args)
+
+
+def info(msg, *args):
+    if INFO >= level:
+        log(INFO, msg, *args)
+
+
+def warning(msg, *args):
+    if WARNING >= level:
+        log(WARNING, msg, *args)
+
+
+def error(msg, *args):
+    if ERROR >= level:
+        log(ERROR, msg, *args)
+
+
+def format_entry(i):
+    """
+    Format entry ``i`` as ``(id, ticks_ms, level name, text)``.
+    """
+    slot = i % SIZE
+    msg = _messages[slot]
+    args = _args[slot]
+    if args:
+        try:
+            msg = msg % args
+        except (TypeError, ValueError):
+            msg = f'{msg} {args}'
+    return i, _times[slot], NAMES.get(_levels[slot], str(_levels[slot])), msg
+
+
+def entries(since=0, min_level=DEBUG):
+    """
+    Get the buffered entries from id ``since`` on.
+
+    Args:
+        since (int): First entry id wanted; older ones may be gone.
+        min_level (int): Skip entries below this level.
+
+    Returns:
+        list: ``(id, ticks_ms, level name, text)`` tuples, oldest first.
+    """
+    first = max(since, _next - SIZE, 0)
+    return [format_entry(i) for i in range(first, _next) if _levels[i % SIZE] >= min_level]
+
+
+def next_id():
+    return _next
+
+
+def flush():
+    """
+    Print every entry not printed yet.
+    """
+    global _printed
+    if _printed < _next - SIZE:
+        _printed = _next - SIZE  # Overwritten while echo was off
+    while _printed < _next:
+        i, t, name, msg = format_entry(_printed)
+        _printed += 1
+        print(f'{t} {name} {msg}')
+
+
+async def run(period_ms=FLUSH_MS):
+    """
+    Print new entries to the console every ``period_ms`` until cancelled.
+    """
+    while True:
+        await asyncio.sleep(period_ms / 1000)
+        if echo:
+            flush()
+
+
+def stats():
+    """
+    Get the level and the buffered, suppressed and dropped entry counts.
+    """
+    return {
+        'level': NAMES.get(level, level),
+        'entries': min(_next, SIZE),
+        'next': _next,
+        'suppressed': suppressed,
+        'dropped': dropped,
+    }
@@ -0,0 +1,262 @@
+"""
+Lightweight latency and counter metrics.
+
+Durations are recorded in microseconds into fixed-size histograms with
+four buckets per power of two, so recording is a handful of integer
+operations and the memory used never grows. Percentiles are reported as
+the upper bound of the bucket they fall into (within 25%).
+"""
+import gc
+from array import array
+
+from ticks import ticks_us, ticks_diff
+
+_SUB_BITS = 2
+_SUB = 1 << _SUB_BITS
+_OCTAVES = 26  # Up to 2**26 us (~67 s)
+_BUCKETS = (_OCTAVES + 1) * _SUB
+_CARRY_BITS = 20  # The running total is kept as (total >> 20, total & 0xFFFFF)
+_CARRY_MASK = (1 << _CARRY_BITS) - 1
+
+
+def _bucket(us):
+    if us < _SUB:
+        return us if us > 0 else 0
+    octave = 0
+    value = us
+    while value >= _SUB * 2:
+        value >>= 1
+        octave += 1
+    index = (octave + 1) * _SUB + (value - _SUB)
+    return index if index < _BUCKETS else _BUCKETS - 1
+
+
+def _bucket_upper(index):
+    if index < _SUB:
+        return index
+    octave = index // _SUB - 1
+    return ((_SUB + index % _SUB + 1) << octave) - 1
+
+
+class Histogram:
+    def __init__(self):
+        """
+        Create an empty histogram of microsecond durations.
+        """
+        self._counts = array('I', [0] * _BUCKETS)
+        self.count = 0
+        self._total_high = 0
+        self._total_low = 0
+        self.max = 0
+
+    def record(self, us):
+        """
+        Add one duration in microseconds.
+
+        The running total is split in two so both parts stay small ints,
+        which MicroPython does not allocate; a single sum passes 2**30 us
+        after 18 minutes of recorded time and would then allocate on every
+        call.
+        """
+        self._counts[_bucket(us)] += 1
+        self.count += 1
+        low = self._total_low + us
+        if low > _CARRY_MASK:
+            self._total_high += low >> _CARRY_BITS
+            low &= _CARRY_MASK
+        self._total_low = low
+        if us > self.max:
+            self.max = us
+
+    @property
+    def total(self):
+        """
+        Sum of all recorded durations in microseconds.
+        """
+        return (self._total_high << _CARRY_BITS) + self._total_low
+
+    def percentile(self, p):
+        """
+        Estimate a percentile.
+
+        Args:
+            p (int): Percentile between 0 and 100.
+
+        Returns:
+            int: Upper bound of the bucket holding the percentile, capped at
+                the maximum recorded value (0 if nothing was recorded).
+        """
+        if not self.count:
+            return 0
+        rank = (self.count * p + 99) // 100
+        seen = 0
+        for index in range(_BUCKETS):
+            seen += self._counts[index]
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+
+    def reset(self):
+        """
+        Clear all recorded durations.
+        """
+        for index in range(_BUCKETS):
+            self._counts[index] = 0
+        self.count = 0
+        self._total_high = 0
+        self._total_low = 0
+        self.max = 0
+
+    def summary(self):
+        """
+        Get count, mean, p50/p95/p99 and max as a dict.
+        """
+        return {
+            'count': self.count,
+            'mean': self.total // self.count if self.count else 0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+# Request stages and motion ticks (servo writes), all in microseconds
+timers = {
+    'recv': Histogram(),
+    'parse': Histogram(),
+    'servo': Histogram(),
+    'send': Histogram(),
+    'request': Histogram(),
+    'sequence_jitter': Histogram(),  # Lateness of sequence waypoints
+    'control_jitter': Histogram(),  # Deviation of motion tick intervals from the period
+    'events': Histogram(),  # Formatting one /events message
+    'replay_jitter': Histogram(),  # Lateness of replayed trajectory samples
+    'gc': Histogram(),  # Garbage collection pauses
+}
+
+counters = {
+    'connections': 0,
+    'requests': 0,
+    'errors': 0,
+    'bad_requests': 0,
+    'not_found': 0,
+    'timeouts': 0,
+    'rejected': 0,
+    'disconnects': 0,
+    'udp_packets': 0,
+    'udp_malformed': 0,
+    'static_bytes': 0,
+}
+
+# Highest value seen since the last reset()
+peaks = {
+    'static_heap_bytes': 0,  # Heap growth while streaming one static file
+}
+
+# Name -> zero-argument callable returning a dict of extra counters
+sources = {}
+
+
+def record(stage, start):
+    """
+    Record the time elapsed since ``start`` (a ``ticks_us()`` value).
+
+    Returns:
+        int: A fresh ``ticks_us()`` value, to chain consecutive stages.
+    """
+    now = ticks_us()
+    timers[stage].record(ticks_diff(now, start))
+    return now
+
+
+def reset():
+    """
+    Clear every histogram and peak; counters keep running.
+    """
+    for hist in timers.values():
+        hist.reset()
+    for name in peaks:
+        peaks[name] = 0
+
+
+def count(name, n=1):
+    """
+    Increment a counter.
+    """
+    counters[name] += n
+
+
+def peak(name, value):
+    """
+    Raise a peak to ``value`` if it is higher.
+    """
+    if value > peaks[name]:
+        peaks[name] = value
+
+
+def mem_alloc():
+    """
+    Get the allocated heap in bytes, or None where the runtime does not report it.
+    """
+    try:
+        return gc.mem_alloc()
+    except AttributeError:
+        return None
+
+
+def mem_free():
+    """
+    Get the free heap in bytes, or None where the runtime does not report it.
+    """
+    try:
+        return gc.mem_free()
+    except AttributeError:
+        return None
+
+
+def snapshot():
+    """
+    Collect every timer, counter, peak and source into one dict.
+    """
+    data = {'timers_us': {}, 'counters': dict(counters), 'peaks': dict(peaks), 'mem_free': mem_free()}
+    for name, hist in timers.items():
+        data['timers_us'][name] = hist.summary()
+    for name, source in sources.items():
+        data[name] = source()
+    return data
+
+
+def prometheus():
+    """
+    Render every timer, counter, peak and source in the Prometheus text format.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines = []
+    for name, hist in timers.items():
+        summary = hist.summary()
+        base = f'joystick_{name}_us'
+        lines.append(f'# TYPE {base} summary')
+        for p in (50, 95, 99):
+            lines.append(f'{base}{{quantile="0.{p}"}} {summary["p" + str(p)]}')
+        lines.append(f'{base}_sum {hist.total}')
+        lines.append(f'{base}_count {hist.count}')
+        lines.append(f'joystick_{name}_us_max {hist.max}')
+    for name, value in counters.items():
+        lines.append(f'joystick_{name}_total {value}')
+    for name, value in peaks.items():
+        lines.append(f'joystick_{name}_peak {value}')
+    for source_name, source in sources.items():
+        for name, value in source().items():
+            if isinstance(value, bool):
+                value = int(value)
+            elif not isinstance(value, (int, float)):
+                continue  # Labels such as a sequence name are JSON-only
+            lines.append(f'joystick_{source_name}_{name} {value}')
+    free = mem_free()
+    if free is not None:
+        lines.append(f'joystick_mem_free_bytes {free}')
+    lines.append('')
+    return '\n'.join(lines)
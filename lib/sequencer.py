@@ -0,0 +1,194 @@
+"""
+Timed motion sequences (center, shoot, panorama) run in the background.
+
+A sequence is compiled up front into a list of waypoints, each with an
+offset in milliseconds from the start: move, settle, trigger the shutter,
+release it, next move. A task sleeps until each deadline measured with
+``ticks_ms`` and records how late every waypoint actually ran.
+"""
+from ticks import ticks_ms, ticks_diff, ticks_add
+
+import metrics
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+MOVE = 0
+TRIGGER = 1
+RELEASE = 2
+DONE = 3  # No-op marking when the last move should have arrived
+
+PAN = 1
+TILT = 2
+CENTER = 90
+
+_jitter_timer = metrics.timers['sequence_jitter']
+
+
+class Sequencer:
+    def __init__(self, motion, shutter=None, settle_ms=300, pulse_ms=100, arrive_timeout_ms=3000):
+        """
+        Create a sequencer driving a motion engine.
+
+        Args:
+            motion (MotionEngine): Engine whose mailbox receives the moves.
+            shutter (Pin, optional): Output pin wired to the camera's remote
+                shutter; pulsed high for ``pulse_ms`` per shot.
+            settle_ms (int): Pause after arriving before a shot is taken.
+            pulse_ms (int): Length of the shutter pulse.
+            arrive_timeout_ms (int): Longest wait for the head to stop moving
+                before a shot is taken anyway.
+        """
+        self.motion = motion
+        self.shutter = shutter
+        self.settle_ms = settle_ms
+        self.pulse_ms = pulse_ms
+        self.arrive_timeout_ms = arrive_timeout_ms
+        self._task = None
+        self.name = None
+        self.step = 0
+        self.steps = 0
+        self.shots = 0
+        self.jitter_ms = 0
+        self.jitter_ms_max = 0
+        self.cancelled = 0
+
+    def travel_ms(self, distance):
+        """
+        Estimate how long the motion engine takes to travel ``distance`` degrees.
+        """
+        speed = self.motion.max_speed
+        accel = self.motion.accel
+        if distance <= 0:
+            return 0
+        if distance < speed * speed / accel:
+            return int(2000 * (distance / accel) ** 0.5)  # Triangular profile
+        return int(1000 * (distance / speed + speed / accel))
+
+    def _shot(self, steps, at):
+        steps.append((at, TRIGGER, 0, 0))
+        steps.append((at + self.pulse_ms, RELEASE, 0, 0))
+        return at + self.pulse_ms
+
+    def center(self):
+        """
+        Move pan and tilt back to the centre.
+        """
+        distance = max(abs(self.motion.target(PAN) - CENTER), abs(self.motion.target(TILT) - CENTER))
+        self.start('center', [(0, MOVE, PAN, CENTER), (0, MOVE, TILT, CENTER),
+                              (self.travel_ms(distance), DONE, 0, 0)])
+
+    def shoot(self):
+        """
+        Take a single shot where the head is pointing.
+        """
+        steps = []
+        self._shot(steps, 0)
+        self.start('shoot', steps)
+
+    def panorama(self, shots=5, span=90):
+        """
+        Sweep the pan axis across ``span`` degrees around the centre,
+        stopping for ``shots`` evenly spaced shots.
+
+        Raises:
+            ValueError: If shots or span are out of range.
+        """
+        if not 1 <= shots <= 36:
+            raise ValueError("Shots must be between 1 and 36")
+        if not 0 <= span <= self.motion.degrees:
+            raise ValueError(f"Span must be between 0 and {self.motion.degrees}")
+        first = CENTER - span / 2
+        step = span / (shots - 1) if shots > 1 else 0
+        position = self.motion.target(PAN)
+        steps = []
+        at = 0
+        for i in range(shots):
+            angle = min(max(int(first + i * step + 0.5), 0), self.motion.degrees)
+            steps.append((at, MOVE, PAN, angle))
+            at += self.travel_ms(abs(angle - position)) + self.settle_ms
+            at = self._shot(steps, at)
+            position = angle
+        self.start('panorama', steps)
+
+    def start(self, name, steps):
+        """
+        Replace any running sequence with ``steps`` and start it.
+
+        Args:
+            name (str): Name reported in the progress.
+            steps (list): (offset_ms, action, channel, angle) waypoints.
+        """
+        self.cancel()
+        self.name = name
+        self.step = 0
+        self.steps = len(steps)
+        self.shots = 0
+        self._task = asyncio.create_task(self._run(steps))
+
+    def cancel(self):
+        """
+        Stop the running sequence, if any, leaving the head where it is.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self.cancelled += 1
+            if self.shutter is not None:
+                self.shutter.value(0)
+
+    def running(self):
+        return self._task is not None
+
+    async def _run(self, steps):
+        start = ticks_ms()
+        for offset, action, channel, angle in steps:
+            deadline = ticks_add(start, offset)
+            wait = ticks_diff(deadline, ticks_ms())
+            if wait > 0:
+                await asyncio.sleep(wait / 1000)
+            if action == TRIGGER and self.motion.is_moving():
+                # Never shoot while the head is still travelling
+                arrive = ticks_ms()
+                while self.motion.is_moving() and ticks_diff(ticks_ms(), arrive) < self.arrive_timeout_ms:
+                    await asyncio.sleep(0.01)
+                waited = ticks_diff(ticks_ms(), arrive)
+                start = ticks_add(start, waited)  # Later waypoints shift with the shot
+                deadline = ticks_add(deadline, waited)
+            late = max(ticks_diff(ticks_ms(), deadline), 0)
+            self.jitter_ms = late
+            if late > self.jitter_ms_max:
+                self.jitter_ms_max = late
+            _jitter_timer.record(late * 1000)
+
+            if action == MOVE:
+                self.motion.mailbox.post(channel, angle)
+            elif action == TRIGGER:
+                if self.shutter is not None:
+                    self.shutter.value(1)
+                self.shots += 1
+            elif action == RELEASE and self.shutter is not None:
+                self.shutter.value(0)
+            self.step += 1
+        self._task = None
+
+    def progress(self):
+        """
+        Get the progress of the current or last sequence.
+
+        Returns:
+            dict: Name, completed and total steps, shots taken, whether it
+                is running, and the last and worst waypoint lateness in ms.
+        """
+        return {
+            'name': self.name,
+            'running': self.running(),
+            'step': self.step,
+            'steps': self.steps,
+            'shots': self.shots,
+            'jitter_ms': self.jitter_ms,
+            'jitter_ms_max': self.jitter_ms_max,
+            'cancelled': self.cancelled,
+        }
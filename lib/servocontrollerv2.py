@@ -1,18 +1,86 @@
+from array import array
 from machine import Pin, PWM
+from ticks import ticks_us, ticks_diff, ticks_add, sleep_us
+import log
+import metrics
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+_servo_timer = metrics.timers['servo']  # One sample per motion tick, not per write
+_jitter_timer = metrics.timers['control_jitter']
+
+
+def _isqrt(n):
+    # Newton's method on ints; below 2**30 every step stays a small int
+    if n < 2:
+        return n
+    x = 1 << 15 if n < 1 << 30 else n
+    y = (x + n // x) >> 1
+    while y < x:
+        x = y
+        y = (x + n // x) >> 1
+    return x
 
 class ServoController:
-    def __init__(self, pins=[18, 19, 20, 21], freq=50):
+    def __init__(self, pins=[18, 19, 20, 21], freq=50, degrees=180, min_duty=3000, max_duty=11000):
         """
         Initialize the ServoController with given pins.
         
         Args:
             pins (list): List of GPIO pins to use for servos.
             freq (int): PWM frequency (default 50Hz for standard servos).
+            degrees (int): Maximum degrees of rotation (default 180).
+            min_duty (int): duty_u16 value at 0 degrees for every channel.
+            max_duty (int): duty_u16 value at ``degrees`` for every channel.
         """
         self._servos = [PWM(Pin(pin)) for pin in pins]
+        self._duty_u16 = [servo.duty_u16 for servo in self._servos]
+        self._cdeg = [None] * len(pins)  # Last angle in hundredths of a degree
+        self._duty = [0] * len(pins)
         self.freq = freq
+        self.degrees = degrees
+        self.recorder = None  # Trajectory sampling the angles each motion tick
         for servo in self._servos:
             servo.freq(freq)
+        self._tables = [self._duty_table(min_duty, max_duty) for _ in pins]
+
+    def _duty_table(self, min_duty, max_duty):
+        # One duty_u16 value per whole degree, so writes are a single lookup
+        span = max_duty - min_duty
+        return array('H', (int(((angle / self.degrees) * span) + min_duty)
+                           for angle in range(self.degrees + 1)))
+
+    def calibrate(self, num, min_us, max_us):
+        """
+        Set the pulse widths a servo expects at 0 and at full rotation.
+
+        Args:
+            num (int): Servo number (1-indexed).
+            min_us (int): Pulse width in microseconds at 0 degrees.
+            max_us (int): Pulse width in microseconds at full rotation.
+        """
+        if not 1 <= num <= len(self._servos):
+            raise ValueError(f"Servo number must be between 1 and {len(self._servos)}")
+        period_us = 1000000 // self.freq
+        self._tables[num - 1] = self._duty_table(min_us * 65535 // period_us,
+                                                 max_us * 65535 // period_us)
+        if self._cdeg[num - 1] is not None:
+            self._duty[num - 1] = 0  # Force a rewrite with the new table
+            self._write_cdeg(num - 1, self._cdeg[num - 1])
+
+    def _write(self, i, angle):
+        self._write_cdeg(i, int(angle * 100 + 0.5))
+
+    def _write_cdeg(self, i, cdeg):
+        # Hot path: integers only, so nothing is allocated; no PWM write if unchanged
+        duty = self._tables[i][(cdeg + 50) // 100]
+        self._cdeg[i] = cdeg
+        if duty != self._duty[i]:
+            self._duty[i] = duty
+            self._duty_u16[i](duty)
     
     def servo(self, num, angle, degrees=180):
         """
@@ -30,11 +98,70 @@ class ServoController:
             raise ValueError(f"Servo number must be between 1 and {len(self._servos)}")
         if not 0 <= angle <= degrees:
             raise ValueError(f"Angle must be between 0 and {degrees}")
-        
-        # Map angle to duty cycle (2.5% to 12.5%)
-        duty = int(((angle / degrees) * 8000) + 3000)
-        self._servos[num - 1].duty_u16(duty)
-        print(f"Servo {num}: angle={angle}, duty={duty}")  # Debug log
+        if degrees != self.degrees:
+            angle = angle * self.degrees / degrees
+        self._write(num - 1, angle)
+
+    def move_many(self, angles):
+        """
+        Set the angles of several servos in one call.
+
+        All angles are validated before any servo is written, so an invalid
+        entry leaves every channel untouched. The writes share one set of
+        attribute lookups instead of going through ``servo()`` per channel.
+
+        Args:
+            angles (dict): Servo number (1-indexed) to angle.
+
+        Raises:
+            ValueError: If a servo number or angle is out of bounds.
+        """
+        count = len(self._servos)
+        degrees = self.degrees
+        for num, angle in angles.items():
+            if not 1 <= num <= count:
+                raise ValueError(f"Servo number must be between 1 and {count}")
+            if not 0 <= angle <= degrees:
+                raise ValueError(f"Angle must be between 0 and {degrees}")
+        tables = self._tables
+        cdegs = self._cdeg
+        duties = self._duty
+        for num, angle in angles.items():
+            i = num - 1
+            if type(angle) is int:
+                # Whole degrees index the table directly, without float maths
+                cdeg = angle * 100
+                duty = tables[i][angle]
+            else:
+                cdeg = int(angle * 100 + 0.5)
+                duty = tables[i][(cdeg + 50) // 100]
+            cdegs[i] = cdeg
+            if duty != duties[i]:
+                duties[i] = duty
+                self._duty_u16[i](duty)
+
+    def angle(self, num):
+        """
+        Get the last angle written to a servo.
+
+        Args:
+            num (int): Servo number (1-indexed).
+
+        Returns:
+            float: Last commanded angle, or None if released or never set.
+        """
+        cdeg = self._cdeg[num - 1]
+        return None if cdeg is None else cdeg / 100
+
+    def centidegrees(self, num):
+        """
+        Get the last angle written to a servo in hundredths of a degree,
+        without allocating, or None if released or never set.
+        """
+        return self._cdeg[num - 1]
+
+    def __len__(self):
+        return len(self._servos)
     
     def release(self, num=None):
         """
@@ -47,11 +174,15 @@ class ServoController:
             if not 1 <= num <= len(self._servos):
                 raise ValueError(f"Servo number must be between 1 and {len(self._servos)}")
             self._servos[num - 1].duty_u16(0)
-            print(f"Servo {num} released")  # Debug log
+            self._cdeg[num - 1] = None
+            self._duty[num - 1] = 0
+            log.debug("Servo %d released", num)
         else:
             for i, servo in enumerate(self._servos, start=1):
                 servo.duty_u16(0)
-                print(f"Servo {i} released")  # Debug log
+                self._cdeg[i - 1] = None
+                self._duty[i - 1] = 0
+            log.debug("All servos released")
     
     def cleanup(self):
         """
@@ -59,4 +190,254 @@ class ServoController:
         """
         for servo in self._servos:
             servo.deinit()
-        print("All servos deinitialized")  # Debug log
+        log.debug("All servos deinitialized")
+
+
+class MotionEngine:
+    def __init__(self, controller, max_speed=180.0, accel=720.0, period_ms=20, mailbox=None):
+        """
+        Move servos towards target angles from a periodic tick.
+
+        Each channel follows a trapezoidal velocity profile: it accelerates
+        at ``accel`` up to ``max_speed`` and brakes so it comes to rest on
+        the target. Targets can change at any time; the channel carries its
+        current velocity into the new move instead of restarting.
+
+        The profile is computed in integer hundredths of a degree, which
+        stay small ints on MicroPython (floats are heap objects there), so
+        a tick allocates nothing and never triggers a garbage collection.
+
+        Args:
+            controller (ServoController): Controller whose servos are driven.
+            max_speed (float): Maximum speed in degrees per second.
+            accel (float): Acceleration and deceleration in degrees per second².
+            period_ms (int): Tick period in milliseconds (default 20, one PWM frame).
+            mailbox (CommandMailbox, optional): Mailbox whose pending targets
+                are collected at the start of every tick.
+        """
+        self.controller = controller
+        self.max_speed = max_speed
+        self.accel = accel
+        self.period_ms = period_ms
+        self.mailbox = mailbox
+        self.degrees = controller.degrees
+        self._speed_max = int(max_speed * 100)
+        self._accel = int(accel * 100)
+        self._brake = self._speed_max * self._speed_max // (2 * self._accel)  # From full speed
+        self._limit = self.degrees * 100
+        n = len(controller)
+        self._position = [9000] * n
+        self._target = [9000] * n
+        self._velocity = [0] * n
+        self._moving = [False] * n
+        for i in range(n):
+            cdeg = controller.centidegrees(i + 1)
+            if cdeg is not None:
+                self._position[i] = self._target[i] = cdeg
+        self._timer = None
+        self._running = False
+        self._last_tick = None
+        self.tick_us = 0
+        self.tick_us_max = 0
+        self.overruns = 0
+
+    def move_to(self, num, angle):
+        """
+        Set a new target angle; returns immediately.
+
+        Args:
+            num (int): Servo number (1-indexed).
+            angle (float): Target angle.
+
+        Raises:
+            ValueError: If servo number or angle is out of bounds.
+        """
+        if not 1 <= num <= len(self._target):
+            raise ValueError(f"Servo number must be between 1 and {len(self._target)}")
+        if not 0 <= angle <= self.degrees:
+            raise ValueError(f"Angle must be between 0 and {self.degrees}")
+        self._target[num - 1] = angle * 100 if isinstance(angle, int) else int(angle * 100 + 0.5)
+        self._moving[num - 1] = True
+
+    def position(self, num):
+        """
+        Get the current (interpolated) angle of a servo.
+        """
+        return self._position[num - 1] / 100
+
+    def target(self, num):
+        """
+        Get the target angle of a servo.
+        """
+        return self._target[num - 1] / 100
+
+    def is_moving(self, num=None):
+        """
+        Check whether a servo, or any servo if ``num`` is None, is in motion.
+        """
+        if num is None:
+            return True in self._moving
+        return self._moving[num - 1]
+
+    def stop(self):
+        """
+        Halt all channels where they are, without easing out.
+        """
+        for i in range(len(self._target)):
+            self._target[i] = self._position[i]
+            self._velocity[i] = 0
+            self._moving[i] = False
+
+    def release(self, num=None):
+        """
+        Stop motion and release servo(s) to stop holding position.
+
+        Args:
+            num (int, optional): Servo number to release. If None, releases all servos.
+        """
+        self.stop()
+        self.controller.release(num)
+
+    def tick(self):
+        """
+        Advance every moving channel by one step and write changed angles.
+
+        The elapsed time since the previous tick is measured and clamped to
+        two periods, so a late tick catches up without jumping. If the
+        controller has a recorder, the written angles are sampled into it.
+        The cost of each tick is recorded in ``tick_us``/``tick_us_max``
+        and the ``servo`` metrics histogram, and the deviation of the
+        interval between ticks from the period in ``control_jitter``. A
+        tick that takes longer than the period counts as an overrun.
+        """
+        start = ticks_us()
+        if self._last_tick is None:
+            dt = 1000 * self.period_ms
+        else:
+            interval = ticks_diff(start, self._last_tick)
+            _jitter_timer.record(abs(interval - 1000 * self.period_ms))
+            dt = min(interval, 2000 * self.period_ms)
+        self._last_tick = start
+        if self.mailbox is not None:
+            self.mailbox.apply(self)
+        # Speed gained per tick; dt is scaled down first to keep the product small
+        accel_step = self._accel * (dt // 100) // 10000
+        for i in range(len(self._moving)):
+            if self._moving[i]:
+                self._step(i, dt, accel_step)
+        recorder = self.controller.recorder
+        if recorder is not None:
+            recorder.sample(self.controller)
+        self.tick_us = ticks_diff(ticks_us(), start)
+        _servo_timer.record(self.tick_us)
+        if self.tick_us > self.tick_us_max:
+            self.tick_us_max = self.tick_us
+        if self.tick_us > self.period_ms * 1000:
+            self.overruns += 1
+
+    def _step(self, i, dt, accel_step):
+        # Angles in hundredths of a degree, speeds in hundredths per second, dt in us
+        position = self._position[i]
+        target = self._target[i]
+        direction = 1 if target >= position else -1
+        distance = (target - position) * direction
+        speed = self._velocity[i] * direction  # Negative when heading away from the target
+
+        # Fastest speed from which the channel can still brake onto the target
+        if distance >= self._brake:
+            desired = self._speed_max
+        else:
+            desired = _isqrt(2 * self._accel * distance)
+        if speed < desired:
+            speed = min(speed + accel_step, desired)
+        else:
+            speed = max(speed - accel_step, desired)
+
+        velocity = speed * direction
+        position += velocity * (dt // 10) // 100000
+        if speed >= 0 and (target - position) * direction <= 0:
+            position = target  # Arrived (or would overshoot)
+            velocity = 0
+            self._moving[i] = False
+        elif position < 0:
+            position = 0  # Braking after a retarget can carry past the end stops
+        elif position > self._limit:
+            position = self._limit
+        self._position[i] = position
+        self._velocity[i] = velocity
+        self.controller._write_cdeg(i, position)
+
+    def stats(self):
+        """
+        Get the tick cost counters.
+
+        Returns:
+            dict: Last and worst tick duration in microseconds and the
+                number of ticks that overran the period.
+        """
+        return {
+            'tick_us': self.tick_us,
+            'tick_us_max': self.tick_us_max,
+            'overruns': self.overruns,
+        }
+
+    def start_timer(self):
+        """
+        Drive the engine from a periodic ``machine.Timer``.
+
+        Returns:
+            bool: True if a timer was started, False if the platform has none
+                (run :meth:`run` as an asyncio task instead).
+        """
+        try:
+            from machine import Timer
+        except ImportError:
+            return False
+        self._timer = Timer(mode=Timer.PERIODIC, period=self.period_ms,
+                            callback=lambda t: self.tick())
+        return True
+
+    async def run(self):
+        """
+        Drive the engine from an asyncio task, ticking every ``period_ms``.
+        """
+        while True:
+            self.tick()
+            await asyncio.sleep(self.period_ms / 1000)
+
+    def run_forever(self):
+        """
+        Drive the engine from a blocking loop, e.g. in a dedicated thread.
+
+        Ticks are scheduled against absolute deadlines so the period does
+        not drift. Returns after :meth:`deinit`.
+        """
+        period_us = self.period_ms * 1000
+        deadline = ticks_us()
+        self._running = True
+        while self._running:
+            self.tick()
+            deadline = ticks_add(deadline, period_us)
+            wait = ticks_diff(deadline, ticks_us())
+            if wait > 0:
+                sleep_us(wait)
+            elif wait < -period_us:
+                deadline = ticks_us()  # Fell a whole period behind: resynchronise
+
+    def start_thread(self):
+        """
+        Run :meth:`run_forever` in a new thread, which is the second core
+        on the RP2040. Use a mailbox with a lock to feed it targets.
+        """
+        import _thread
+        self._running = True
+        _thread.start_new_thread(self.run_forever, ())
+
+    def deinit(self):
+        """
+        Stop the hardware timer or control thread, if one was started.
+        """
+        self._running = False
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
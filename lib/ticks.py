@@ -0,0 +1,33 @@
+"""
+Tick counter helpers.
+
+Re-exports MicroPython's ``time.ticks_*`` functions and provides
+equivalents with the same wrap-around semantics when running under
+CPython, so timing code runs unmodified on the device and on the host.
+"""
+try:
+    from time import ticks_ms, ticks_us, ticks_diff, ticks_add, sleep_ms, sleep_us
+except ImportError:
+    import time
+
+    _TICKS_PERIOD = 1 << 30
+    _TICKS_MAX = _TICKS_PERIOD - 1
+    _TICKS_HALFPERIOD = _TICKS_PERIOD // 2
+
+    def ticks_ms():
+        return (time.monotonic_ns() // 1000000) & _TICKS_MAX
+
+    def ticks_us():
+        return (time.monotonic_ns() // 1000) & _TICKS_MAX
+
+    def ticks_diff(ticks1, ticks2):
+        return ((ticks1 - ticks2 + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
+
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & _TICKS_MAX
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+    def sleep_us(us):
+        time.sleep(us / 1000000)
@@ -0,0 +1,257 @@
+"""
+Recording and replay of pan/tilt trajectories.
+
+A Trajectory stores timestamped servo angles in two preallocated arrays:
+``times`` (``array('I')``, milliseconds since the recording started) and
+``angles`` (``array('H')``, tenths of a degree, one column per channel).
+A sample is only stored when an angle changed, so holding still costs
+nothing and moving costs 4 + 2 * channels bytes per motion tick.
+
+On flash a trajectory is a 12-byte header followed by the channel
+numbers and the used part of both arrays, written straight from the
+arrays' buffers in the board's native (little-endian) byte order::
+
+    magic  b'TRJ1'
+    B      format version (1)
+    B      number of channels
+    H      reserved (0)
+    I      number of samples
+
+The Player replays one in the background, posting the angles to the
+motion engine's mailbox at their recorded offsets.
+"""
+import struct
+from array import array
+
+from ticks import ticks_ms, ticks_diff, ticks_add
+
+import metrics
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+MAGIC = b'TRJ1'
+VERSION = 1
+HEADER = '<4sBBHI'
+HEADER_SIZE = struct.calcsize(HEADER)
+RELEASED = 0xFFFF  # Angle of a channel that was not being driven
+
+_jitter_timer = metrics.timers['replay_jitter']
+
+
+class Trajectory:
+    def __init__(self, channels=(1, 2), capacity=3000):
+        """
+        Create an empty trajectory.
+
+        Args:
+            channels (tuple): Servo numbers (1-indexed) to record.
+            capacity (int): Maximum number of samples. Each costs
+                4 + 2 * len(channels) bytes, allocated up front.
+        """
+        self.channels = tuple(channels)
+        self.capacity = capacity
+        self.times = array('I', [0] * capacity)
+        self.angles = array('H', [0] * (capacity * len(self.channels)))
+        self.count = 0
+        self.recording = False
+        self.full = False
+        self._start = 0
+
+    def start(self):
+        """
+        Discard any samples and start recording.
+        """
+        self.count = 0
+        self.full = False
+        self._start = ticks_ms()
+        self.recording = True
+
+    def stop(self):
+        self.recording = False
+
+    def sample(self, controller):
+        """
+        Store the controller's current angles if any of them changed.
+
+        Called by the motion engine once per tick while recording.
+
+        Args:
+            controller (ServoController): Controller whose angles are read.
+        """
+        if not self.recording:
+            return
+        count = self.count
+        if count == self.capacity:
+            self.recording = False
+            self.full = True
+            return
+        n = len(self.channels)
+        row = count * n
+        changed = count == 0
+        for j in range(n):
+            cdeg = controller.centidegrees(self.channels[j])
+            value = RELEASED if cdeg is None else (cdeg + 5) // 10
+            self.angles[row + j] = value
+            if not changed and value != self.angles[row - n + j]:
+                changed = True
+        if changed:
+            self.times[count] = ticks_diff(ticks_ms(), self._start)
+            self.count = count + 1
+
+    def angle(self, i, j):
+        """
+        Get the angle of channel column ``j`` in sample ``i``, or None if
+        the channel was released.
+        """
+        value = self.angles[i * len(self.channels) + j]
+        return None if value == RELEASED else value / 10
+
+    def duration_ms(self):
+        return self.times[self.count - 1] - self.times[0] if self.count else 0
+
+    def nbytes(self):
+        """
+        Get the size of the recorded samples in bytes (excluding the header).
+        """
+        return self.count * (4 + 2 * len(self.channels))
+
+    def save(self, path):
+        """
+        Write the recorded samples to a file.
+        """
+        n = len(self.channels)
+        with open(path, 'wb') as f:
+            f.write(struct.pack(HEADER, MAGIC, VERSION, n, 0, self.count))
+            f.write(bytes(self.channels))
+            f.write(memoryview(self.times)[:self.count])
+            f.write(memoryview(self.angles)[:self.count * n])
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a trajectory written by :meth:`save`.
+
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If it is not a trajectory file.
+        """
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+            if len(header) != HEADER_SIZE:
+                raise ValueError("Truncated trajectory file")
+            magic, version, n, _, count = struct.unpack(HEADER, header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("Not a trajectory file")
+            traj = cls(tuple(f.read(n)), count)
+            times = memoryview(traj.times)
+            angles = memoryview(traj.angles)
+            if f.readinto(times) != 4 * count or f.readinto(angles) != 2 * count * n:
+                raise ValueError("Truncated trajectory file")
+        traj.count = count
+        return traj
+
+    def stats(self):
+        return {
+            'recording': self.recording,
+            'full': self.full,
+            'samples': self.count,
+            'capacity': self.capacity,
+            'duration_ms': self.duration_ms(),
+            'bytes': self.nbytes(),
+        }
+
+
+class Player:
+    def __init__(self, motion, arrive_timeout_ms=3000):
+        """
+        Create a player driving a motion engine.
+
+        Args:
+            motion (MotionEngine): Engine whose mailbox receives the angles.
+            arrive_timeout_ms (int): Longest wait for the head to reach the
+                first sample before the clock starts anyway.
+        """
+        self.motion = motion
+        self.arrive_timeout_ms = arrive_timeout_ms
+        self._task = None
+        self.name = None
+        self.step = 0
+        self.steps = 0
+        self.skipped = 0
+        self.jitter_ms_max = 0
+
+    def start(self, name, trajectory):
+        """
+        Replace any running replay with ``trajectory`` and start it.
+        """
+        self.cancel()
+        self.name = name
+        self.step = 0
+        self.steps = trajectory.count
+        self.skipped = 0
+        self.jitter_ms_max = 0
+        self._task = asyncio.create_task(self._run(trajectory))
+
+    def cancel(self):
+        """
+        Stop the running replay, if any, leaving the head where it is.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def running(self):
+        return self._task is not None
+
+    def _post(self, trajectory, i):
+        post = self.motion.mailbox.post
+        for j in range(len(trajectory.channels)):
+            angle = trajectory.angle(i, j)
+            if angle is not None:
+                post(trajectory.channels[j], angle)
+
+    async def _run(self, trajectory):
+        times = trajectory.times
+        count = trajectory.count
+        if count:
+            # Travel to the first sample before the clock starts
+            self._post(trajectory, 0)
+            arrive = ticks_ms()
+            await asyncio.sleep(2 * self.motion.period_ms / 1000)
+            while self.motion.is_moving() and ticks_diff(ticks_ms(), arrive) < self.arrive_timeout_ms:
+                await asyncio.sleep(0.01)
+        start = ticks_ms()
+        first = times[0] if count else 0
+        i = 1
+        while i < count:
+            deadline = ticks_add(start, times[i] - first)
+            wait = ticks_diff(deadline, ticks_ms())
+            if wait > 0:
+                await asyncio.sleep(wait / 1000)
+            # When running late, jump to the newest sample that is due
+            now = ticks_ms()
+            while i + 1 < count and ticks_diff(now, ticks_add(start, times[i + 1] - first)) >= 0:
+                i += 1
+                self.skipped += 1
+            late = max(ticks_diff(now, ticks_add(start, times[i] - first)), 0)
+            if late > self.jitter_ms_max:
+                self.jitter_ms_max = late
+            _jitter_timer.record(late * 1000)
+            self._post(trajectory, i)
+            i += 1
+            self.step = i
+        self.step = count
+        self._task = None
+
+    def progress(self):
+        return {
+            'name': self.name,
+            'running': self.running(),
+            'step': self.step,
+            'steps': self.steps,
+            'skipped': self.skipped,
+            'jitter_ms_max': self.jitter_ms_max,
+        }
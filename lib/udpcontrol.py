@@ -0,0 +1,41 @@
+"""
+Compact binary joystick packets for the UDP control channel.
+
+Every packet is 8 bytes, network byte order::
+
+    magic (B) | flags (B) | seq (H) | x (h) | y (h)
+
+``x``/``y`` are joystick positions in -100..100 and ``seq`` is a wrapping
+16-bit sequence number. The upper four bits of ``flags`` select the
+pan/tilt head (0 for the first). UDP never retransmits, so a lost packet is simply
+superseded by the next one instead of stalling it as TCP would.
+"""
+import struct
+
+MAGIC = 0xA5
+FORMAT = '!BBHhh'
+SIZE = 8
+
+FLAG_STOP = 0x01  # Release the servos; x/y are ignored
+FLAG_ACK = 0x02   # Echo the packet back to the sender, for latency probes
+HEAD_SHIFT = 4    # flags >> HEAD_SHIFT is the head number
+
+
+def pack_into(buf, seq, x, y, flags=0):
+    """
+    Encode a packet into ``buf`` (at least SIZE bytes).
+    """
+    struct.pack_into(FORMAT, buf, 0, MAGIC, flags, seq & 0xFFFF, x, y)
+
+
+def unpack(buf):
+    """
+    Decode a packet from ``buf``.
+
+    Returns:
+        tuple: (flags, seq, x, y), or None if the magic byte is wrong.
+    """
+    magic, flags, seq, x, y = struct.unpack_from(FORMAT, buf, 0)
+    if magic != MAGIC:
+        return None
+    return flags, seq, x, y
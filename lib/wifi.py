@@ -0,0 +1,199 @@
+"""
+Wi-Fi connection management with fast startup and in-process reconnects.
+
+The network that worked last time is remembered in a small JSON file and
+tried first on the next boot, so a normal start is a single association
+instead of a walk through every configured SSID. The link status is
+polled every ``POLL_MS`` instead of once a second, and a static address
+can be configured to skip DHCP.
+
+Once connected, :meth:`Wifi.wait_lost` returns when the link drops and
+:meth:`Wifi.wait_ready` reconnects, retrying with a growing pause, all
+without resetting the board: the motion engine keeps holding the servos
+while the server rebinds.
+"""
+import json
+import network
+
+import log
+from ticks import ticks_ms, ticks_diff
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+STAT_GOT_IP = 3
+POLL_MS = 50  # Status poll interval while associating
+CHECK_MS = 500  # Link check interval once connected
+RETRY_MS_MAX = 8000  # Longest pause between passes over all networks
+
+
+class Wifi:
+    def __init__(self, networks, state_file='wifi.json', timeout_ms=10000, static=None):
+        """
+        Create the station interface manager.
+
+        Time to ready is measured from here, so create it first thing at
+        boot.
+
+        Args:
+            networks: (ssid, password) pairs, tried in order after the one
+                remembered from the last successful connection.
+            state_file (str): File holding the last good connection, or
+                None to remember nothing.
+            timeout_ms (int): Longest wait for one network to connect.
+            static (tuple, optional): (ip, netmask, gateway, dns) to use
+                instead of DHCP.
+        """
+        self.networks = networks
+        self.state_file = state_file
+        self.timeout_ms = timeout_ms
+        self.static = static
+        self.wlan = network.WLAN(network.STA_IF)
+        self.wlan.active(True)
+        self.state = self._load()
+        self.ssid = None
+        self.ip = None
+        self.connects = 0
+        self.failures = 0
+        self.drops = 0
+        self.ready_ms = None
+        self.reconnect_ms = None
+        self.reconnect_ms_max = 0
+        self._since = ticks_ms()
+        self._booted = False
+
+    def _load(self):
+        if self.state_file is None:
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        if self.state_file is None:
+            return
+        try:
+            channel = self.wlan.config('channel')
+        except (ValueError, OSError):
+            channel = None
+        state = {'ssid': self.ssid, 'channel': channel, 'ifconfig': list(self.wlan.ifconfig())}
+        if state == self.state:
+            return  # Spare the flash when nothing changed
+        try:
+            with open(self.state_file, 'w') as f:
+                json.dump(state, f)
+            self.state = state
+        except OSError as e:
+            log.warning("Could not save Wi-Fi state: %s", e)
+
+    def _order(self):
+        # The remembered network first, then the rest in configured order
+        last = self.state.get('ssid')
+        first = [n for n in self.networks if n[0] == last]
+        return first + [n for n in self.networks if n[0] != last]
+
+    async def connect(self):
+        """
+        Try each network once.
+
+        Returns:
+            str: The IP address, or None if no network connected.
+        """
+        wlan = self.wlan
+        for ssid, password in self._order():
+            log.info("Attempting to connect to %s", ssid)
+            if self.static is not None:
+                wlan.ifconfig(self.static)
+            wlan.connect(ssid, password)
+            start = ticks_ms()
+            status = wlan.status()
+            while 0 <= status < STAT_GOT_IP and ticks_diff(ticks_ms(), start) < self.timeout_ms:
+                await asyncio.sleep(POLL_MS / 1000)
+                status = wlan.status()
+            if status == STAT_GOT_IP:
+                self.ssid = ssid
+                self.ip = wlan.ifconfig()[0]
+                self.connects += 1
+                log.info("Connected to %s on %s in %d ms", ssid, self.ip, ticks_diff(ticks_ms(), start))
+                self._save()
+                return self.ip
+            self.failures += 1
+            log.warning("Failed to connect to %s (status %d)", ssid, status)
+            wlan.disconnect()
+        return None
+
+    async def wait_ready(self):
+        """
+        Connect, retrying until some network accepts us.
+
+        Returns:
+            str: The IP address to bind to.
+        """
+        if self.wlan.isconnected() and self.ip is not None:
+            return self.ip
+        pause = POLL_MS
+        while True:
+            ip = await self.connect()
+            if ip is not None:
+                return ip
+            log.warning("No network available, retrying in %d ms", pause)
+            await asyncio.sleep(pause / 1000)
+            pause = min(pause * 4, RETRY_MS_MAX)
+
+    async def wait_lost(self):
+        """
+        Return once the link to the access point is lost.
+        """
+        while self.wlan.isconnected():
+            await asyncio.sleep(CHECK_MS / 1000)
+        self.drops += 1
+        self.ip = None
+        self._since = ticks_ms()
+        log.warning("Wi-Fi link lost")
+
+    def mark_ready(self):
+        """
+        Record that the server is listening again, completing the boot or
+        the reconnect being timed.
+        """
+        elapsed = ticks_diff(ticks_ms(), self._since)
+        if not self._booted:
+            self._booted = True
+            self.ready_ms = elapsed
+        else:
+            self.reconnect_ms = elapsed
+            if elapsed > self.reconnect_ms_max:
+                self.reconnect_ms_max = elapsed
+
+    def disconnect(self):
+        self.wlan.disconnect()
+        self.ip = None
+
+    def stats(self):
+        """
+        Get the connection state and timings.
+
+        Returns:
+            dict: Current SSID and IP, signal strength, connect, failure and
+                drop counts, time to ready at boot and after the last and
+                worst drop, all in ms.
+        """
+        try:
+            rssi = self.wlan.status('rssi')
+        except (ValueError, OSError, TypeError):
+            rssi = None
+        return {
+            'ssid': self.ssid,
+            'ip': self.ip,
+            'rssi': rssi,
+            'connects': self.connects,
+            'failures': self.failures,
+            'drops': self.drops,
+            'ready_ms': self.ready_ms,
+            'reconnect_ms': self.reconnect_ms,
+            'reconnect_ms_max': self.reconnect_ms_max,
+        }
@@ -0,0 +1,19 @@
+"""
+Host-side simulation of the Pico W for running the joystick server on Linux.
+
+``install()`` puts the stand-in ``machine``/``network`` modules, the
+device ``lib`` directory and the repository root on ``sys.path``, in the
+order MicroPython would resolve them on the board.
+"""
+import os
+import sys
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SIM_DIR)
+LIB_DIR = os.path.join(ROOT, 'lib')
+
+
+def install():
+    for path in (ROOT, LIB_DIR, SIM_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
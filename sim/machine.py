@@ -0,0 +1,124 @@
+"""
+Stand-in for MicroPython's ``machine`` module on a CPython host.
+
+Only the pieces used by this project are provided. PWM objects are a
+recording servo backend: they keep the current duty, count writes and
+log every change with a timestamp so benchmarks can check what reached
+the "hardware". Timer keeps time on a background thread but, when
+created inside a running asyncio loop, runs its callback on that loop:
+a soft timer callback on the device runs atomically with respect to the
+main program, so code such as the command mailbox takes no lock in timer
+mode and must not be entered from two threads at once here.
+"""
+import asyncio
+import collections
+import threading
+import time
+
+HISTORY = 4096  # Duty changes kept per PWM channel
+
+
+class Pin:
+    OUT = 1
+    IN = 0
+
+    def __init__(self, id, mode=-1, value=None):
+        self.id = id
+        self._value = value or 0
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+
+class PWM:
+    instances = []
+    record = True  # Log every change in history; writes are counted either way
+
+    def __init__(self, pin):
+        self.pin = pin
+        self._freq = 0
+        self._duty = 0
+        self.writes = 0
+        self.history = collections.deque(maxlen=HISTORY)  # (monotonic_ns, duty)
+        PWM.instances.append(self)
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = value
+        self.writes += 1
+        if PWM.record:
+            self.history.append((time.monotonic_ns(), value))
+
+    def deinit(self):
+        self._duty = 0
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, mode=PERIODIC, period=-1, callback=None, freq=-1):
+        self._thread = None
+        self._stop = threading.Event()
+        if callback is not None:
+            self.init(mode=mode, period=period, callback=callback, freq=freq)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=-1):
+        self.deinit()
+        if freq > 0:
+            period = 1000 / freq
+        self._stop = threading.Event()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None  # No event loop to interleave with; call from the thread
+        self._thread = threading.Thread(
+            target=self._run, args=(mode, period / 1000, callback, loop, self._stop), daemon=True)
+        self._thread.start()
+
+    def _run(self, mode, period, callback, loop, stop):
+        deadline = time.monotonic()
+        while True:
+            deadline += period
+            if stop.wait(max(deadline - time.monotonic(), 0)):
+                return
+            if loop is None:
+                callback(self)
+            else:
+                try:
+                    loop.call_soon_threadsafe(self._fire, callback, stop)
+                except RuntimeError:
+                    return  # The loop was closed
+            if mode == Timer.ONE_SHOT:
+                return
+
+    def _fire(self, callback, stop):
+        if not stop.is_set():  # deinit() may have run since this was queued
+            callback(self)
+
+    def deinit(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread = None
+
+
+def freq(value=None):
+    return 125000000
+
+
+def reset():
+    raise SystemExit("machine.reset()")
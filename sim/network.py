@@ -0,0 +1,77 @@
+"""
+Stand-in for MicroPython's ``network`` module on a CPython host.
+
+WLAN always "connects" to whatever SSID it is given and reports the
+loopback address, so the web server binds to localhost. ``drop()`` and
+``fail_ssids`` let a test simulate link loss and unreachable networks,
+and ``connect_ms`` how long an association takes.
+"""
+from time import monotonic
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+IP = '127.0.0.1'
+
+
+class WLAN:
+    fail_ssids = set()  # SSIDs whose connect() reports "no AP found"
+    connect_ms = 0  # Time from connect() until an address is obtained
+    instances = []
+
+    def __init__(self, interface=STA_IF):
+        WLAN.instances.append(self)
+        self.interface = interface
+        self._active = False
+        self._status = STAT_IDLE
+        self._ssid = None
+        self._ifconfig = (IP, '255.0.0.0', IP, IP)
+        self._ready_at = 0
+
+    def active(self, value=None):
+        if value is None:
+            return self._active
+        self._active = bool(value)
+
+    def connect(self, ssid=None, key=None, bssid=None):
+        self._ssid = ssid
+        self._status = STAT_NO_AP_FOUND if ssid in WLAN.fail_ssids else STAT_CONNECTING
+        self._ready_at = monotonic() + WLAN.connect_ms / 1000
+
+    def disconnect(self):
+        self._status = STAT_IDLE
+
+    def drop(self):
+        # Simulate the access point going away
+        self._status = STAT_CONNECT_FAIL
+
+    def status(self, param=None):
+        if param == 'rssi':
+            return -50
+        if self._status == STAT_CONNECTING and monotonic() >= self._ready_at:
+            self._status = STAT_GOT_IP
+        return self._status
+
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._ifconfig
+        self._ifconfig = config
+
+    def config(self, *args, **kwargs):
+        if args == ('ssid',) or args == ('essid',):
+            return self._ssid
+        if args == ('channel',):
+            return 6
+        if args == ('mac',):
+            return b'\x28\xcd\xc1\x00\x00\x01'
+        return None
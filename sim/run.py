@@ -0,0 +1,60 @@
+"""
+Run the joystick web server on the host against the simulated hardware.
+
+    python sim/run.py --port 8080
+
+The UDP control channel listens on the next port up unless --udp-port
+says otherwise. ``--wifi-drop-every`` drops the simulated Wi-Fi link
+periodically to exercise the reconnect path.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sim  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8080, help='TCP port (default 8080)')
+    parser.add_argument('--udp-port', type=int, default=None,
+                        help='UDP control port (default: TCP port + 1; 0 disables)')
+    parser.add_argument('--dual-core', action='store_true',
+                        help='run the motion loop in its own thread')
+    parser.add_argument('--wifi-state', default=os.path.join(tempfile.gettempdir(), 'joystick-wifi.json'),
+                        help='file remembering the last good network')
+    parser.add_argument('--trajectory-dir', default=os.path.join(tempfile.gettempdir(), 'joystick-trajectories'),
+                        help='directory /record/stop saves recordings to')
+    parser.add_argument('--wifi-connect-ms', type=int, default=0,
+                        help='simulated association time (default 0)')
+    parser.add_argument('--wifi-drop-every', type=float, default=None, metavar='SECONDS',
+                        help='drop the simulated Wi-Fi link periodically')
+    args = parser.parse_args()
+    udp_port = args.port + 1 if args.udp_port is None else (args.udp_port or None)
+
+    sim.install()
+    import network
+    import web_joystick
+    network.WLAN.connect_ms = args.wifi_connect_ms
+    web_joystick.WIFI_STATE = args.wifi_state
+    web_joystick.TRAJECTORY_DIR = args.trajectory_dir
+    web_joystick.STATIC_DIR = os.path.join(sim.ROOT, 'www')
+    if args.wifi_drop_every:
+        threading.Thread(target=drop_links, args=(network, args.wifi_drop_every), daemon=True).start()
+    web_joystick.main(args.port, udp_port, args.dual_core)
+
+
+def drop_links(network, interval):
+    while True:
+        time.sleep(interval)
+        for wlan in network.WLAN.instances:
+            wlan.drop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Precompress the web UI files for the Pico.
+
+Writes a ``.gz`` copy next to every file in ``www/`` that gzip makes
+smaller; the server streams those to browsers that accept gzip and falls
+back to the plain file otherwise. Copy the whole
+directory to the board afterwards:
+
+    python tools/build_www.py
+    mpremote cp -r www :
+"""
+import argparse
+import gzip
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build(directory):
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith('.gz') or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(packed) >= len(data):
+            if os.path.exists(path + '.gz'):
+                os.remove(path + '.gz')
+            print(f"{name}: {len(data)} bytes, left uncompressed")
+            continue
+        with open(path + '.gz', 'wb') as f:
+            f.write(packed)
+        print(f"{name}: {len(data)} -> {len(packed)} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', nargs='?', default=os.path.join(ROOT, 'www'))
+    build(parser.parse_args().directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+"""
+Drive several joystick boards at once from a desktop.
+
+Each unit is reached over one persistent ``/ws`` WebSocket, opened once
+and reused for every move and stop. A fleet command is written to every
+unit before any acknowledgement is awaited, so the boards receive it
+within a few hundred microseconds of each other instead of one round
+trip apart. Commands the WebSocket does not carry (``/batch``,
+``/center``, ``/panorama``, ``/replay``, ``/metrics``) go out as
+concurrent HTTP requests. Every command reports the latency or the
+failure of each unit.
+
+Units are listed with ``--unit host[:port]``, found by probing a subnet
+with ``--scan``, or started locally on the simulated hardware with
+``--spawn``:
+
+    python tools/fleet.py --unit 192.168.1.50 --unit 192.168.1.51 move 40 -20
+    python tools/fleet.py --scan 192.168.1.0/24 stop
+    python tools/fleet.py --spawn 3 sweep --rate 30 --duration 5
+
+It can also be used as a library::
+
+    fleet = Fleet([Unit('192.168.1.50'), Unit('192.168.1.51')])
+    await fleet.connect()
+    report = await fleet.move(40, -20)
+    await fleet.close()
+"""
+import argparse
+import asyncio
+import base64
+import ipaddress
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+from load import http_get, percentile, ws_frame  # noqa: E402
+
+WS_TEXT = 0x1
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xA
+
+
+class UnitError(Exception):
+    pass
+
+
+class Unit:
+    def __init__(self, host, port=80, name=None, timeout=2.0):
+        """
+        Create a handle on one board. Nothing is opened until :meth:`connect`.
+
+        Args:
+            host (str): Address of the board.
+            port (int): Its HTTP port.
+            name (str, optional): Label used in reports, ``host:port`` by default.
+            timeout (float): Seconds to wait for a connection or a reply.
+        """
+        self.host = host
+        self.port = port
+        self.name = name or f'{host}:{port}'
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.seq = 0
+        self.connects = 0
+        self.commands = 0
+        self.failures = 0
+        self.last_error = None
+        self.latencies = []
+        self._lock = asyncio.Lock()
+
+    def connected(self):
+        return self.writer is not None
+
+    async def connect(self):
+        """
+        Open the WebSocket unless it is already open.
+
+        Raises:
+            UnitError: If the board refuses the upgrade.
+            OSError, asyncio.TimeoutError: If it cannot be reached.
+        """
+        if self.writer is not None:
+            return
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                self.timeout)
+        key = base64.b64encode(os.urandom(16))
+        writer.write(b'GET /ws HTTP/1.1\r\nHost: %s\r\nUpgrade: websocket\r\n'
+                     b'Connection: Upgrade\r\nSec-WebSocket-Key: %s\r\n'
+                     b'Sec-WebSocket-Version: 13\r\n\r\n' % (self.host.encode(), key))
+        try:
+            await writer.drain()
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            writer.close()
+            raise
+        if b' 101 ' not in head.split(b'\r\n', 1)[0]:
+            writer.close()
+            raise UnitError(head.split(b'\r\n', 1)[0].decode('latin-1'))
+        self.reader = reader
+        self.writer = writer
+        self.connects += 1
+
+    def _drop(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            try:
+                self.writer.write(ws_frame(WS_CLOSE, b'\x03\xe8'))
+                await self.writer.drain()
+            except OSError:
+                pass
+        self._drop()
+
+    def send_move(self, x, y, head=0):
+        """
+        Write a sequenced move on the open WebSocket without waiting for it.
+
+        Returns:
+            int: Sequence number to pass to :meth:`wait_ack`.
+        """
+        self.seq = (self.seq + 1) & 0xFFFF
+        self.writer.write(ws_frame(WS_TEXT, f'{x},{y},{self.seq},{head}'.encode()))
+        return self.seq
+
+    def send_stop(self):
+        self.writer.write(ws_frame(WS_TEXT, b'stop'))
+
+    async def wait_ack(self, seq):
+        """
+        Read frames until the acknowledgement of ``seq`` arrives, answering
+        pings and skipping late acknowledgements of earlier moves.
+        """
+        await self.wait_reply(b'%d' % seq)
+
+    async def wait_stop(self):
+        """
+        Read frames until the board confirms it has released the servos.
+        """
+        await self.wait_reply(b'stop')
+
+    async def wait_reply(self, reply):
+        await self.writer.drain()
+        while True:
+            header = await self.reader.readexactly(2)
+            payload = await self.reader.readexactly(header[1] & 0x7F)
+            opcode = header[0] & 0x0F
+            if opcode == WS_TEXT and payload == reply:
+                return
+            if opcode == WS_PING:
+                self.writer.write(ws_frame(WS_PONG, payload))
+            elif opcode == WS_CLOSE:
+                raise UnitError("Closed by the board")
+
+    async def run(self, command):
+        """
+        Run one command coroutine function against this unit and time it.
+
+        The WebSocket is (re)opened if needed, and dropped on any failure
+        so that the next command starts from a fresh connection.
+
+        Args:
+            command: Coroutine function taking the unit.
+
+        Returns:
+            dict: Unit name, ``ok``, latency in ms and the error if any.
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            self.commands += 1
+            try:
+                result = await asyncio.wait_for(command(self), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, UnitError) as e:
+                self._drop()
+                self.failures += 1
+                self.last_error = str(e) or type(e).__name__
+                return {'unit': self.name, 'ok': False, 'ms': None, 'error': self.last_error}
+            elapsed = time.perf_counter() - start
+            self.latencies.append(elapsed)
+            report = {'unit': self.name, 'ok': True, 'ms': round(elapsed * 1000, 3), 'error': None}
+            if result is not None:
+                report['result'] = result
+            return report
+
+    async def get(self, path):
+        """
+        Send one HTTP request to the board.
+
+        Returns:
+            The decoded JSON body, or None for a plain ``OK``.
+
+        Raises:
+            UnitError: If the board answers anything but 200.
+        """
+        status, body = await http_get(self.host, self.port, path, self.timeout)
+        if status != 200:
+            raise UnitError(f'{path} answered {status}')
+        return json.loads(body) if body.startswith((b'{', b'[')) else None
+
+    def stats(self):
+        return {
+            'unit': self.name,
+            'connected': self.connected(),
+            'connects': self.connects,
+            'commands': self.commands,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(self.latencies, 95) * 1000, 3),
+            'max_ms': round(max(self.latencies, default=0) * 1000, 3),
+        }
+
+
+class Fleet:
+    def __init__(self, units):
+        """
+        Group units so one call commands all of them.
+
+        Args:
+            units (list): Unit instances.
+        """
+        self.units = list(units)
+
+    async def fanout(self, command):
+        """
+        Run ``command`` against every unit concurrently.
+
+        Returns:
+            list: One report per unit, in unit order (see :meth:`Unit.run`).
+        """
+        return await asyncio.gather(*(unit.run(command) for unit in self.units))
+
+    async def connect(self):
+        async def command(unit):
+            await unit.connect()
+        return await self.fanout(command)
+
+    async def close(self):
+        await asyncio.gather(*(unit.close() for unit in self.units))
+
+    async def move(self, x, y, head=0):
+        """
+        Move one head on every unit, with joystick positions in -100..100.
+
+        The frames are written to every connected unit before any
+        acknowledgement is awaited, so the boards all get the move at
+        nearly the same moment.
+        """
+        pending = {}
+        for unit in self.units:
+            if unit.connected() and not unit._lock.locked():
+                try:
+                    pending[unit] = unit.send_move(x, y, head)
+                except OSError:
+                    unit._drop()
+
+        async def command(unit):
+            if unit in pending:
+                await unit.wait_ack(pending[unit])
+            else:
+                # Reconnects only after the connected units have their frames
+                await unit.connect()
+                await unit.wait_ack(unit.send_move(x, y, head))
+        return await self.fanout(command)
+
+    async def stop(self):
+        """
+        Release the servos on every unit.
+
+        A unit only reports ``ok`` once the board has acknowledged the
+        stop; a connection that accepts the frame but never answers
+        fails after the unit's timeout.
+        """
+        async def command(unit):
+            await unit.connect()
+            unit.send_stop()
+            await unit.wait_stop()
+        return await self.fanout(command)
+
+    async def batch(self, angles, seq=None):
+        """
+        Set servo angles in degrees on every unit through ``/batch``.
+
+        Args:
+            angles (dict): Servo number (1-indexed) to angle.
+            seq (int, optional): Sequence number passed along.
+        """
+        path = '/batch?' + '&'.join(f'c{num}={angle}' for num, angle in sorted(angles.items()))
+        if seq is not None:
+            path += f'&s={seq}'
+        return await self.get(path)
+
+    async def get(self, path):
+        async def command(unit):
+            return await unit.get(path)
+        return await self.fanout(command)
+
+    async def center(self):
+        return await self.get('/center')
+
+    async def panorama(self, shots=5, span=90):
+        return await self.get(f'/panorama?shots={shots}&span={span}')
+
+    async def replay(self, name):
+        return await self.get(f'/replay?name={name}')
+
+    async def status(self):
+        return await self.get('/metrics')
+
+    def stats(self):
+        return [unit.stats() for unit in self.units]
+
+
+async def discover(network, port=80, timeout=0.5, limit=64):
+    """
+    Find joystick boards on a subnet by asking every address for ``/metrics``.
+
+    Args:
+        network (str): Subnet such as ``'192.168.1.0/24'``.
+        port (int): HTTP port to probe.
+        timeout (float): Seconds to wait for each address.
+        limit (int): Most probes in flight at once.
+
+    Returns:
+        list: A Unit for every address that answered like a board.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def probe(host):
+        async with semaphore:
+            try:
+                status, body = await http_get(host, port, '/metrics', timeout)
+                return status == 200 and 'commands' in json.loads(body)
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+                return False
+
+    hosts = [str(host) for host in ipaddress.ip_network(network, strict=False).hosts()]
+    found = await asyncio.gather(*(probe(host) for host in hosts))
+    return [Unit(host, port) for host, ok in zip(hosts, found) if ok]
+
+
+def spawn(count, port):
+    """
+    Start ``count`` servers on the simulated hardware, on every other port
+    from ``port`` up (each also takes the next port for UDP).
+
+    Returns:
+        tuple: The processes and a Unit for each.
+    """
+    procs = []
+    units = []
+    for i in range(count):
+        unit_port = port + 2 * i
+        state = os.path.join(tempfile.gettempdir(), f'joystick-wifi-{unit_port}.json')
+        procs.append(subprocess.Popen([sys.executable, os.path.join(ROOT, 'sim', 'run.py'),
+                                       '--port', str(unit_port), '--wifi-state', state],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        units.append(Unit('127.0.0.1', unit_port))
+    deadline = time.monotonic() + 10
+    for unit in units:
+        while True:
+            try:
+                asyncio.run(http_get(unit.host, unit.port, '/metrics', 0.5))
+                break
+            except (OSError, asyncio.TimeoutError):
+                if time.monotonic() > deadline:
+                    for proc in procs:
+                        proc.kill()
+                    raise RuntimeError('Simulated servers did not start')
+                time.sleep(0.1)
+    return procs, units
+
+
+def print_reports(reports):
+    for report in reports:
+        if report['ok']:
+            result = report.get('result')
+            extra = f"  {json.dumps(result)}" if result is not None else ''
+            print(f"  {report['unit']:<22} ok   {report['ms']:8.3f} ms{extra}")
+        else:
+            print(f"  {report['unit']:<22} FAIL {report['error']}")
+
+
+async def sweep(fleet, rate, duration):
+    # Every unit follows the same circle, one synchronized move per period
+    period = 1 / rate
+    start = time.perf_counter()
+    next_send = start
+    failures = 0
+    while time.perf_counter() - start < duration:
+        angle = (time.perf_counter() - start) * 2
+        reports = await fleet.move(int(math.cos(angle) * 80), int(math.sin(angle) * 80))
+        failures += sum(not report['ok'] for report in reports)
+        next_send += period
+        await asyncio.sleep(max(next_send - time.perf_counter(), 0))
+    print(f"Swept {len(fleet.units)} units for {duration} s, {failures} failed moves")
+    for stats in fleet.stats():
+        print(f"  {stats['unit']:<22} commands {stats['commands']:<5} failures {stats['failures']:<3} "
+              f"p50 {stats['p50_ms']:7.3f} ms  p95 {stats['p95_ms']:7.3f} ms  max {stats['max_ms']:7.3f} ms")
+
+
+async def run(args, units):
+    fleet = Fleet(units)
+    try:
+        print_reports(await fleet.connect())
+        if args.command == 'move':
+            reports = await fleet.move(args.x, args.y, args.head)
+        elif args.command == 'stop':
+            reports = await fleet.stop()
+        elif args.command == 'batch':
+            angles = {}
+            for item in args.angles:
+                num, _, angle = item.partition('=')
+                angles[int(num.lstrip('c'))] = int(angle)
+            reports = await fleet.batch(angles)
+        elif args.command == 'center':
+            reports = await fleet.center()
+        elif args.command == 'panorama':
+            reports = await fleet.panorama(args.shots, args.span)
+        elif args.command == 'replay':
+            reports = await fleet.replay(args.name)
+        elif args.command == 'status':
+            reports = await fleet.status()
+        else:
+            await sweep(fleet, args.rate, args.duration)
+            return 0
+        print(f"{args.command}:")
+        print_reports(reports)
+        return sum(not report['ok'] for report in reports)
+    finally:
+        await fleet.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--unit', action='append', default=[], metavar='HOST[:PORT]',
+                        help='board to drive (repeatable)')
+    parser.add_argument('--scan', metavar='SUBNET', help='probe a subnet such as 192.168.1.0/24')
+    parser.add_argument('--port', type=int, default=80, help='HTTP port for --scan and --unit (default 80)')
+    parser.add_argument('--spawn', type=int, default=0, metavar='N',
+                        help='start N simulated boards on ports from --spawn-port')
+    parser.add_argument('--spawn-port', type=int, default=8080)
+    parser.add_argument('--timeout', type=float, default=2.0, help='seconds per unit and command')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('move', help='move a head on every unit')
+    p.add_argument('x', type=int)
+    p.add_argument('y', type=int)
+    p.add_argument('--head', type=int, default=0)
+    sub.add_parser('stop', help='release the servos on every unit')
+    p = sub.add_parser('batch', help='set servo angles, e.g. c1=30 c2=120')
+    p.add_argument('angles', nargs='+')
+    sub.add_parser('center', help='ease every head back to 90 degrees')
+    p = sub.add_parser('panorama', help='start a panorama sweep on every unit')
+    p.add_argument('--shots', type=int, default=5)
+    p.add_argument('--span', type=int, default=90)
+    p = sub.add_parser('replay', help='replay a saved trajectory on every unit')
+    p.add_argument('name')
+    sub.add_parser('status', help='fetch /metrics from every unit')
+    p = sub.add_parser('sweep', help='sweep every unit in a circle together')
+    p.add_argument('--rate', type=float, default=30, help='moves per second')
+    p.add_argument('--duration', type=float, default=5, help='seconds')
+    args = parser.parse_args()
+
+    units = []
+    for spec in args.unit:
+        host, _, port = spec.partition(':')
+        units.append(Unit(host, int(port) if port else args.port, timeout=args.timeout))
+    if args.scan:
+        found = asyncio.run(discover(args.scan, args.port))
+        print(f"Found {len(found)} units on {args.scan}")
+        units.extend(found)
+    procs = []
+    if args.spawn:
+        procs, spawned = spawn(args.spawn, args.spawn_port)
+        units.extend(spawned)
+    if not units:
+        sys.exit("No units: give --unit, --scan or --spawn")
+    for unit in units:
+        unit.timeout = args.timeout
+    try:
+        failed = asyncio.run(run(args, units))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
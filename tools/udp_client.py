@@ -0,0 +1,159 @@
+"""
+Desktop client for the UDP joystick channel.
+
+Sends 8-byte packets (see ``lib/udpcontrol.py``) to a Pico, or to the
+simulator started with ``sim/run.py``. Three modes:
+
+    python tools/udp_client.py --host 192.168.1.50 sweep --rate 50
+    python tools/udp_client.py --host 192.168.1.50 gamepad
+    python tools/udp_client.py --port 8081 --http-port 8080 latency
+
+``gamepad`` bridges the first joystick found by pygame (left stick pans
+and tilts, button 0 stops). ``latency`` measures round trips of
+acknowledged UDP packets and of HTTP ``/move`` requests, so the two
+paths can be compared on the same network.
+"""
+import argparse
+import math
+import os
+import socket
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'lib'))
+
+import udpcontrol  # noqa: E402
+
+
+class Sender:
+    def __init__(self, host, port, head=0):
+        self.addr = (host, port)
+        self.head = head << udpcontrol.HEAD_SHIFT
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.buf = bytearray(udpcontrol.SIZE)
+        self.seq = 0
+
+    def send(self, x, y, flags=0):
+        self.seq = (self.seq + 1) & 0xFFFF
+        udpcontrol.pack_into(self.buf, self.seq, x, y, flags | self.head)
+        self.sock.sendto(self.buf, self.addr)
+
+    def stop(self):
+        self.send(0, 0, udpcontrol.FLAG_STOP)
+
+
+def sweep(sender, rate, duration):
+    period = 1 / rate
+    start = time.monotonic()
+    next_send = start
+    while time.monotonic() - start < duration:
+        angle = (time.monotonic() - start) * 2
+        sender.send(int(math.cos(angle) * 80), int(math.sin(angle) * 80))
+        next_send += period
+        time.sleep(max(next_send - time.monotonic(), 0))
+    print(f"Sent {sender.seq} packets")
+
+
+def gamepad(sender, rate):
+    try:
+        import pygame
+    except ImportError:
+        sys.exit("gamepad mode needs pygame (pip install pygame)")
+    pygame.init()
+    pygame.joystick.init()
+    if not pygame.joystick.get_count():
+        sys.exit("No gamepad found")
+    stick = pygame.joystick.Joystick(0)
+    print(f"Using {stick.get_name()}, button 0 stops, Ctrl+C quits")
+    period = 1 / rate
+    last = None
+    try:
+        while True:
+            pygame.event.pump()
+            if stick.get_button(0):
+                sender.stop()
+                last = None
+            else:
+                position = (int(stick.get_axis(0) * 100), int(stick.get_axis(1) * 100))
+                if position != last:  # Idle sticks cost nothing on the wire
+                    sender.send(*position)
+                    last = position
+            time.sleep(period)
+    except KeyboardInterrupt:
+        sender.stop()
+
+
+def percentiles(label, samples):
+    samples = sorted(samples)
+    if not samples:
+        print(f"{label:<6} no replies")
+        return
+
+    def at(p):
+        return samples[min(len(samples) - 1, math.ceil(len(samples) * p / 100) - 1)] * 1000
+
+    print(f"{label:<6} n={len(samples):<5} p50 {at(50):7.3f} ms  p95 {at(95):7.3f} ms  "
+          f"p99 {at(99):7.3f} ms  max {samples[-1] * 1000:7.3f} ms")
+
+
+def latency(sender, host, http_port, count):
+    sender.sock.settimeout(1.0)
+    reply = bytearray(udpcontrol.SIZE)
+    udp = []
+    lost = 0
+    for i in range(count):
+        start = time.perf_counter()
+        sender.send(i % 100, -(i % 100), udpcontrol.FLAG_ACK)
+        try:
+            while True:
+                sender.sock.recv_into(reply)
+                if udpcontrol.unpack(reply)[1] == sender.seq:
+                    break
+        except socket.timeout:
+            lost += 1
+            continue
+        udp.append(time.perf_counter() - start)
+
+    http = []
+    for i in range(count):
+        start = time.perf_counter()
+        with socket.create_connection((host, http_port), timeout=2) as conn:
+            conn.sendall(f'GET /move?x={i % 100}&y={-(i % 100)} HTTP/1.0\r\n\r\n'.encode())
+            while conn.recv(256):
+                pass
+        http.append(time.perf_counter() - start)
+
+    percentiles("UDP", udp)
+    percentiles("HTTP", http)
+    if lost:
+        print(f"UDP packets without reply: {lost}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5005, help='UDP control port (default 5005)')
+    parser.add_argument('--head', type=int, default=0, help='pan/tilt head to drive (default 0)')
+    sub = parser.add_subparsers(dest='mode', required=True)
+    p = sub.add_parser('sweep', help='sweep the head in a circle')
+    p.add_argument('--rate', type=float, default=50, help='packets per second')
+    p.add_argument('--duration', type=float, default=10, help='seconds')
+    p = sub.add_parser('gamepad', help='drive the head from a gamepad')
+    p.add_argument('--rate', type=float, default=60, help='stick samples per second')
+    p = sub.add_parser('latency', help='compare UDP and HTTP round trips')
+    p.add_argument('--http-port', type=int, default=80)
+    p.add_argument('--count', type=int, default=500)
+    args = parser.parse_args()
+
+    sender = Sender(args.host, args.port, args.head)
+    if args.mode == 'sweep':
+        sweep(sender, args.rate, args.duration)
+    elif args.mode == 'gamepad':
+        gamepad(sender, args.rate)
+    else:
+        latency(sender, args.host, args.http_port, args.count)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,265 +1,114 @@
 from time import sleep
-import network
+from machine import Pin
+import binascii
+import hashlib
+import json
+import os
+import select
 import socket
 import mysecrets as secrets
-from servocontrollerv2 import ServoController
+from broadcast import Broadcast
+from cmdmailbox import CommandMailbox, SeqFilter
+from httpreq import Request
+import heap
+import log
+import metrics
+from ticks import ticks_us, ticks_ms, ticks_diff
+import udpcontrol
+from sequencer import Sequencer
+from trajectory import Trajectory, Player
+from servocontrollerv2 import ServoController, MotionEngine
+from wifi import Wifi
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 
 SSID1 = secrets.SSID1
 SSID2 = secrets.SSID2
 PASSWORD = secrets.PASSWORD
+NETWORKS = ((SSID1, PASSWORD), (SSID2, PASSWORD))
+WIFI_STATE = 'wifi.json'  # Last good network, tried first on the next boot
+WIFI_STATIC = None  # (ip, netmask, gateway, dns) to skip DHCP, if the router allows
 
-def connect():
-    wlan = network.WLAN(network.STA_IF)
-    wlan.active(True)
+PORT = 80
+BACKLOG = 8  # Pending connections the TCP stack queues before refusing
+MAX_CONNECTIONS = 8  # Clients served at once; more get an immediate 503
+READ_TIMEOUT_MS = 2000  # Longest wait for a complete request head
+WRITE_TIMEOUT_MS = 3000  # Longest time a client may take to accept a response
+WS_PING_MS = 15000  # An idle WebSocket is pinged after this, closed after twice this
+EVENTS_PERIOD_MS = 100  # Rate of /events updates
+EVENTS_MAX_CLIENTS = 4  # /events viewers, counted apart from MAX_CONNECTIONS
+TRAJECTORY_DIR = 'trajectories'  # Recorded sweeps, one .trj file each
+TRAJECTORY_CAPACITY = 3000  # Samples per recording: 60 s of continuous motion, 24 KB
+UDP_PORT = 5005  # Binary joystick packets (see lib/udpcontrol.py); None disables
+UDP_POLL_MS = 2  # Readiness check interval where the event loop cannot wait on a datagram socket
+SHUTTER_PIN = None  # GPIO wired to the camera's remote shutter, if any
+DUAL_CORE = False  # Run the motion loop on the second core instead of a timer
+HEADS = ((1, 2), (3, 4))  # (pan, tilt) servo numbers of each camera head
+REQUEST_SIZE = 1024  # Request line plus headers must fit in this buffer
+GC_THRESHOLD_FRACTION = 4  # Automatic collection after 1/N of the free heap is allocated
+SEQ_SOURCES_MAX = 8  # HTTP and UDP peers whose sequence numbers are tracked
 
-    networks = [
-        (SSID1, PASSWORD),
-        (SSID2, PASSWORD)
-    ]
+WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_TEXT = 0x1
+WS_BINARY = 0x2
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xA
+WS_MAX_PAYLOAD = 125  # Control messages are tiny; never buffer more than this
 
-    for ssid, password in networks:
-        print(f"Attempting to connect to {ssid}")
-        wlan.connect(ssid, password)
+RESPONSE_OK = b'HTTP/1.0 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 2\r\n\r\nOK'
+RESPONSE_BAD_REQUEST = b'HTTP/1.0 400 Bad Request\r\nContent-Length: 0\r\n\r\n'
+RESPONSE_NOT_FOUND = b'HTTP/1.0 404 Not Found\r\nContent-Length: 0\r\n\r\n'
+RESPONSE_TOO_LARGE = b'HTTP/1.0 431 Request Header Fields Too Large\r\nContent-Length: 0\r\n\r\n'
+RESPONSE_UNAVAILABLE = b'HTTP/1.0 503 Service Unavailable\r\nRetry-After: 1\r\nContent-Length: 0\r\n\r\n'
+RESPONSE_STALE = b'HTTP/1.0 409 Conflict\r\nContent-Type: text/plain\r\nContent-Length: 5\r\n\r\nStale'
+
+# Request buffers are reused across connections instead of reallocated
+REQUEST_POOL = []
+
+# /batch query parameter names (b'c1', b'c2', ...), one per servo, set by serve()
+CHANNEL_PARAMS = ()
+ACTIVE_CONNECTIONS = 0
+
+# Mailbox command count at the last idle check (see gc_idle())
+IDLE_RECEIVED = 0
+
+# Background center/shoot/panorama sequences, created by serve()
+SEQUENCER = None
+
+# Live state pushed to /events viewers, created by serve()
+EVENTS = None
+
+# Trajectory being recorded (allocated by the first /record) and its name,
+# and the background replay task, created by serve()
+RECORDING = None
+RECORDING_NAME = None
+PLAYER = None
+
+# Peer address -> SeqFilter for sequenced HTTP and UDP moves; a WebSocket
+# connection keeps its own
+SEQ_SOURCES = {}
+
+# Web UI files streamed from flash, indexed once by scan_static()
+STATIC_DIR = 'www'
+STATIC_CHUNK = 512  # Bytes per read; at most REQUEST_SIZE, whose buffer is reused
+STATIC = []
+_S_IFMT = 0o170000  # File type bits of the os.stat() mode
+_S_IFREG = 0o100000
+
+CONTENT_TYPES = {
+    '.html': b'text/html',
+    '.js': b'application/javascript',
+    '.css': b'text/css',
+    '.json': b'application/json',
+    '.svg': b'image/svg+xml',
+    '.png': b'image/png',
+    '.ico': b'image/x-icon',
+}
 
-        # Add a timeout for the connection attempt
-        max_wait = 10
-        while max_wait > 0:
-            if wlan.status() < 0 or wlan.status() >= 3:
-                break
-            max_wait -= 1
-            print('Waiting for connection...')
-            sleep(1)
-
-        if wlan.status() == 3:  # Check if the connection was successful
-            ip = wlan.ifconfig()[0]
-            print(f'Connected to {ssid} on {ip}')
-            return ip, wlan
-        else:
-            print(f"Failed to connect to {ssid}")
-
-    raise RuntimeError('Failed to connect to any network')
-
-def open_socket(ip):
-    address = (ip, 80)
-    connection = socket.socket()
-    connection.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # Allow reuse of the socket
-    connection.bind(address)
-    connection.listen(1)
-    print("Server listening on port 80...")
-    return connection
-def webpage():
-    """
-    Returns a string containing the HTML for the main webpage.
-    This webpage allows the user to control the robot's servos using
-    two range sliders. The user can set the servo number and angle.
-
-    The webpage also has a "Move" button that sends a GET request to the
-    server with the servo number and angle. The "Stop" button sends a
-    request to stop the servos.
-
-    The HTML is returned as a string so that it can be used as the
-    response to an HTTP request.
-    """
-    html = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Servo Joystick Control</title>
-            <style>
-                body {
-                    font-family: Arial, sans-serif;
-                    text-align: center;
-                    background-color: #f4f4f4;
-                }
-                .joystick-container {
-                    width: 300px;
-                    height: 300px;
-                    background-color: #ddd;
-                    border-radius: 50%;
-                    margin: 50px auto;
-                    position: relative;
-                }
-                .joystick-handle {
-                    width: 60px;
-                    height: 60px;
-                    background-color: #444;
-                    border-radius: 50%;
-                    position: absolute;
-                    top: 50%;
-                    left: 50%;
-                    transform: translate(-50%, -50%);
-                    cursor: pointer;
-                }
-                #output {
-                    margin-top: 20px;
-                }
-            </style>
-        </head>
-        <body>
-            <h1>Servo Joystick Control</h1>
-            <div class="joystick-container" id="joystick-container">
-                <div class="joystick-handle" id="joystick-handle"></div>
-            </div>
-            <div id="output">
-                <p>X: <span id="x-value">0</span></p>
-                <p>Y: <span id="y-value">0</span></p>
-                <button onclick="stopServos()">Stop</button>
-            </div>
-            <script>
-            const joystickKnob = document.querySelector('.joystick-handle');
-            const joystickContainer = document.querySelector('.joystick-container');
-            const viewport = document.querySelector('.viewport');
-            const crosshair = document.querySelector('.crosshair');
-            const status = document.getElementById('status');
-
-            let isDragging = false;
-            let currentX = 150;
-            let currentY = 150;
-            const centerX = 150;
-            const centerY = 150;
-            const maxDistance = 120;
-
-            // Joystick control
-            function handleJoystickMove(clientX, clientY) {
-                const rect = joystickContainer.getBoundingClientRect();
-                let deltaX = clientX - rect.left - centerX;
-                let deltaY = clientY - rect.top - centerY;
-
-                // Limit the joystick movement to the container
-                const distance = Math.sqrt(deltaX * deltaX + deltaY * deltaY);
-                if (distance > maxDistance) {
-                    deltaX = (deltaX / distance) * maxDistance;
-                    deltaY = (deltaY / distance) * maxDistance;
-                }
-
-                currentX = centerX + deltaX;
-                currentY = centerY + deltaY;
-
-                joystickKnob.style.left = `${currentX - 30}px`;
-                joystickKnob.style.top = `${currentY - 30}px`;
-
-                // Convert joystick position to camera angles
-                const panAngle = Math.round(90 + (deltaX / maxDistance) * 65);
-                const tiltAngle = Math.round(90 + (deltaY / maxDistance) * 65);
-
-                sendCommand({
-                    action: 'move',
-                    pan: panAngle,
-                    tilt: tiltAngle
-                });
-            }
-
-            joystickKnob.addEventListener('mousedown', startDragging, { passive: true });
-            document.addEventListener('mousemove', moveJoystick, { passive: true });
-            document.addEventListener('mouseup', stopDragging, { passive: true });
-
-            // Touch events for mobile
-            joystickKnob.addEventListener('touchstart', (e) => {
-                startDragging(e.touches[0]);
-            }, { passive: true });
-
-            document.addEventListener('touchmove', (e) => {
-                if (isDragging) {
-                    moveJoystick(e.touches[0]);
-                }
-            }, { passive: true });
-
-            document.addEventListener('touchend', stopDragging, { passive: true });
-
-            function startDragging(e) {
-                isDragging = true;
-            }
-
-            function moveJoystick(e) {
-                if (isDragging) {
-                    handleJoystickMove(e.clientX, e.clientY);
-                }
-            }
-
-            function stopDragging() {
-                isDragging = false;
-            }
-
-            // Point-to-shoot control
-            viewport.addEventListener('click', (e) => {
-                const rect = viewport.getBoundingClientRect();
-                const x = e.clientX - rect.left;
-                const y = e.clientY - rect.top;
-
-                crosshair.style.left = `${x}px`;
-                crosshair.style.top = `${y}px`;
-
-                // Convert viewport coordinates to camera angles
-                const panAngle = Math.round((x / viewport.clientWidth) * 180);
-                const tiltAngle = Math.round((y / viewport.clientHeight) * 180);
-
-                sendCommand({
-                    action: 'move',
-                    pan: panAngle,
-                    tilt: tiltAngle
-                });
-            });
-
-            // Camera control functions
-            function takeShot() {
-                sendCommand({ action: 'shoot' });
-            }
-
-            function centerCamera() {
-                sendCommand({ action: 'center' });
-            }
-
-            function startPanorama() {
-                sendCommand({
-                    action: 'panorama',
-                    num_shots: 5,
-                    span_angle: 90
-                });
-            }
-
-            function stopServos() {
-                sendCommand({ action: 'stop' });
-            }
-
-            // Command sender
-            
-            const PICO_HOST = location.hostname === '' ? 'http://pico.local' : '';
-
-            function sendCommand(cmd) {
-                // Build a query string: /move?x=13&y=-44   or   /shoot
-                let url;
-                switch (cmd.action) {
-                    case 'move':
-                        // default to 0 if pan/tilt omitted
-                        url = `${PICO_HOST}/move?x=${cmd.pan ?? 0}&y=${cmd.tilt ?? 0}`;
-                        break;
-                    case 'center':
-                        url = `${PICO_HOST}/center`;
-                        break;
-                    case 'panorama':
-                        url = `${PICO_HOST}/panorama?shots=${cmd.num_shots}&span=${cmd.span_angle}`;
-                        break;
-                    case 'shoot':
-                        url = `${PICO_HOST}/shoot`;
-                        break;
-                    case 'stop':
-                        url = `${PICO_HOST}/stop`;
-                        break;
-                    default:
-                        console.warn('Unknown action'); return;
-                }
-
-                fetch(url)
-                    .then(r => r.text())
-                    .then(txt => status.textContent = 'Status: ' + txt.trim())
-                    .catch(err => status.textContent = 'Error: ' + err);
-            }
-            </script>
-        </body>
-        </html>
-    """
-    return html
-    
 # def webpage():
 #     """
 #     Returns a string containing the HTML for the main webpage.
@@ -321,58 +170,975 @@ def webpage():
 #         </html>
 #     """
 #     return html
-def serve(connection, servo):
+def content_type(name):
+    """
+    Guess the Content-Type of a static file from its extension.
+    """
+    dot = name.rfind('.')
+    return CONTENT_TYPES.get(name[dot:] if dot >= 0 else '', b'application/octet-stream')
+
+def file_crc(path, buf):
+    """
+    Compute the CRC32 of a file, reading it through ``buf``.
+    """
+    crc = 0
+    mv = memoryview(buf)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                return crc
+            crc = binascii.crc32(mv[:n], crc)
+
+def scan_static():
+    """
+    Index the files in ``STATIC_DIR`` so requests for them can be served
+    without touching the filesystem until the body is streamed.
+
+    Each entry of ``STATIC`` holds the URL path, file path, Content-Type,
+    size and ETag, plus the size and ETag of a precompressed ``.gz``
+    sibling (None if there is none or it is older than the file). Build
+    those with ``tools/build_www.py``. ``index.html`` is also served at ``/``.
+    """
+    buf = bytearray(STATIC_CHUNK)
+    try:
+        names = sorted(os.listdir(STATIC_DIR))
+    except OSError:
+        log.warning("No static files: %s not found", STATIC_DIR)
+        return
+    for name in names:
+        if name.endswith('.gz'):
+            continue
+        path = STATIC_DIR + '/' + name
+        try:
+            stat = os.stat(path)
+            if stat[0] & _S_IFMT != _S_IFREG:
+                continue  # Subdirectories are not served
+            etag = b'"%08x"' % (file_crc(path, buf) & 0xFFFFFFFF)
+            gz_size = gz_etag = None
+            if name + '.gz' in names:
+                gz_stat = os.stat(path + '.gz')
+                if gz_stat[8] >= stat[8]:
+                    gz_size = gz_stat[6]
+                    gz_etag = b'"%08x-gz"' % (file_crc(path + '.gz', buf) & 0xFFFFFFFF)
+                else:
+                    log.warning("Ignoring stale %s.gz; rerun tools/build_www.py", name)
+        except OSError as e:
+            # One unreadable entry must not stop the server, which would reset the board
+            log.warning("Not serving %s: %r", path, e)
+            continue
+        entry = (b'/' + name.encode(), path, content_type(name), stat[6], etag, gz_size, gz_etag)
+        STATIC.append(entry)
+        if name == 'index.html':
+            STATIC.append((b'/',) + entry[1:])
+    log.info("Serving %d static paths from %s", len(STATIC), STATIC_DIR)
+
+def find_static(req):
+    """
+    Find the ``STATIC`` entry for the request path, or None.
+    """
+    for entry in STATIC:
+        if req.path_is(entry[0]):
+            return entry
+    return None
+
+async def drain(writer):
+    """
+    Flush a writer, giving up if the client does not take the data in time.
+
+    Args:
+        writer: asyncio stream writer of the client connection.
+
+    Raises:
+        asyncio.TimeoutError: If ``WRITE_TIMEOUT_MS`` passes first.
+    """
+    await asyncio.wait_for(writer.drain(), WRITE_TIMEOUT_MS / 1000)
+
+async def close(writer, abort=False):
+    """
+    Close a client connection without waiting on an unresponsive peer.
+
+    Args:
+        writer: asyncio stream writer of the client connection.
+        abort (bool): Discard unsent data instead of flushing it; for
+            clients that already timed out.
+    """
+    transport = getattr(writer, 'transport', None)
+    if abort and transport is not None:
+        transport.abort()  # CPython would otherwise keep flushing to a dead peer
+    writer.close()
+    try:
+        await asyncio.wait_for(writer.wait_closed(), WRITE_TIMEOUT_MS / 1000)
+    except Exception:
+        pass
+
+def send_response(writer, status, body=b'', content_type=b'text/plain', headers=b''):
+    """
+    Queue a complete HTTP/1.0 response with an explicit Content-Length.
+
+    The response is flushed by ``handle_client`` once the handler returns.
+
+    Args:
+        writer: asyncio stream writer of the client connection.
+        status (bytes): Status line suffix, e.g. b'200 OK'.
+        body (bytes): Response body.
+        content_type (bytes): Value of the Content-Type header.
+        headers (bytes): Extra CRLF-terminated header lines.
+    """
+    writer.write(b'HTTP/1.0 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n%s\r\n'
+                 % (status, content_type, len(body), headers))
+    if body:
+        writer.write(body)
+
+async def send_static(req, writer, entry):
+    """
+    Stream a static file in ``STATIC_CHUNK`` pieces, honouring ETag
+    revalidation and serving the ``.gz`` copy to clients that accept it.
+
+    The body is read with ``readinto`` into the request's own buffer,
+    which is free once the headers below have been looked at, and each
+    chunk is drained before the buffer is refilled, so partial socket
+    writes are completed by the stream and a page load never holds more
+    than one chunk of the file in RAM. The whole body must be delivered
+    within ``WRITE_TIMEOUT_MS``.
+
+    Args:
+        req (Request): Parsed request; its buffer is overwritten.
+        writer: asyncio stream writer of the client connection.
+        entry (tuple): ``STATIC`` entry of the file.
+    """
+    url, path, ctype, size, etag, gz_size, gz_etag = entry
+    headers = b'Cache-Control: no-cache\r\n'
+    if gz_size is not None and b'gzip' in (req.header(b'accept-encoding') or b''):
+        path += '.gz'
+        size = gz_size
+        etag = gz_etag
+        headers += b'Content-Encoding: gzip\r\nVary: Accept-Encoding\r\n'
+    if req.header(b'if-none-match') == etag:
+        writer.write(b'HTTP/1.0 304 Not Modified\r\nETag: %s\r\n%s\r\n' % (etag, headers))
+        return
+    writer.write(b'HTTP/1.0 200 OK\r\nContent-Type: %s\r\nContent-Length: %d\r\nETag: %s\r\n%s\r\n'
+                 % (ctype, size, etag, headers))
+    # One timeout for the whole body: a wait_for per chunk would allocate
+    # a task and timeout handle every STATIC_CHUNK bytes
+    sent = await asyncio.wait_for(stream_file(writer, path, size, req.mv[:STATIC_CHUNK]),
+                                  WRITE_TIMEOUT_MS / 1000)
+    metrics.count('static_bytes', sent)
+
+async def stream_file(writer, path, size, buf):
+    """
+    Write up to ``size`` bytes of a file to a client, one buffer at a time.
+
+    Returns:
+        int: Bytes sent.
+    """
+    transport = getattr(writer, 'transport', None)
+    if transport is not None:
+        # CPython 3.12+ queues the memoryview itself rather than a copy, so
+        # drain() must wait until it is sent before buf is refilled
+        transport.set_write_buffer_limits(0)
+    heap = metrics.mem_alloc()
+    sent = 0
+    with open(path, 'rb') as f:
+        while sent < size:
+            # Never past Content-Length, even if the file grew since scan_static()
+            n = f.readinto(buf if size - sent >= len(buf) else buf[:size - sent])
+            if not n:
+                break
+            writer.write(buf[:n])
+            await writer.drain()
+            sent += n
+            if heap is not None:
+                metrics.peak('static_heap_bytes', metrics.mem_alloc() - heap)
+    return sent
+
+def seq_source(peer):
+    """
+    Get the sequence state of an HTTP or UDP peer, creating it on first use.
+
+    Only the newest ``SEQ_SOURCES_MAX`` peers are tracked; a forgotten
+    one starts afresh, as after ``SEQ_RESET_MS`` of silence.
+
+    Args:
+        peer: Hashable peer address, such as its IP.
+
+    Returns:
+        SeqFilter: The peer's sequence state.
+    """
+    source = SEQ_SOURCES.get(peer)
+    if source is None:
+        if len(SEQ_SOURCES) >= SEQ_SOURCES_MAX:
+            oldest = None
+            for key, other in SEQ_SOURCES.items():
+                # Every tracked peer has had a move accepted, so ms is set
+                if oldest is None or ticks_diff(other.ms, SEQ_SOURCES[oldest].ms) < 0:
+                    oldest = key
+            del SEQ_SOURCES[oldest]
+        source = SEQ_SOURCES[peer] = SeqFilter()
+    return source
+
+def peer_host(writer):
+    """
+    Get the IP address of an HTTP client, or None if the stream has none.
+    """
+    peer = writer.get_extra_info('peername')
+    return peer[0] if peer else None
+
+def move(motion, x, y, seq=None, head=0, source=None):
+    """
+    Point a pan/tilt head at a joystick position.
+
+    The targets are posted to the motion engine's mailbox, which keeps
+    only the newest one per axis until the next tick picks it up, so this
+    never blocks. A sequenced move that is not newer than the client's
+    last one is dropped before it is posted.
+
+    Args:
+        motion (MotionEngine): Motion engine driving the pan/tilt servos.
+        x (int): Horizontal joystick position (-100 to 100).
+        y (int): Vertical joystick position (-100 to 100).
+        seq (int, optional): Client sequence number of the move.
+        head (int): Index into ``HEADS`` (default 0).
+        source (SeqFilter, optional): Sequence state of the sending
+            client; required with ``seq``.
+
+    Returns:
+        bool: False if the move was dropped as out of order.
+    """
+    if seq is not None and not source.accept(seq):
+        motion.mailbox.reject(2)
+        return False
+    pan, tilt = HEADS[head]
+    # Map x and y to specific servo movements
+    servo_x_angle = (x + 100) * 90 // 100  # Normalize to 0-180
+    servo_y_angle = (y + 100) * 90 // 100  # Normalize to 0-180
+
+    if SEQUENCER is not None:
+        SEQUENCER.cancel()  # Manual control takes over from a running sequence
+        PLAYER.cancel()
+    motion.mailbox.post(pan, servo_x_angle)
+    motion.mailbox.post(tilt, servo_y_angle)
+    return True
+
+def stop(motion):
+    """
+    Cancel any sequence or replay, drop pending moves and release the servos.
+
+    Args:
+        motion (MotionEngine): Motion engine driving the pan/tilt servos.
+    """
+    if SEQUENCER is not None:
+        SEQUENCER.cancel()
+        PLAYER.cancel()
+    motion.mailbox.stop(motion)
+
+def ws_accept_key(key):
+    """
+    Compute the Sec-WebSocket-Accept value for a handshake key (RFC 6455).
+
+    Args:
+        key (bytes): Value of the Sec-WebSocket-Key request header.
+    """
+    digest = hashlib.sha1(key + WS_GUID).digest()
+    return binascii.b2a_base64(digest).strip()
+
+async def ws_read_frame(reader):
+    """
+    Read one WebSocket frame sent by the browser.
+
+    Args:
+        reader: asyncio stream reader of the client connection.
+
+    Returns:
+        tuple: Opcode and unmasked payload bytes.
+
+    Raises:
+        ValueError: If the frame is unmasked, fragmented or too large.
+    """
+    header = await reader.readexactly(2)
+    opcode = header[0] & 0x0F
+    length = header[1] & 0x7F
+    if not header[0] & 0x80:
+        raise ValueError("Fragmented WebSocket frames are not supported")
+    if not header[1] & 0x80:
+        raise ValueError("Client WebSocket frames must be masked")
+    if length == 126:
+        ext = await reader.readexactly(2)
+        length = (ext[0] << 8) | ext[1]
+    elif length == 127:
+        raise ValueError("WebSocket frame too large")
+    if length > WS_MAX_PAYLOAD:
+        raise ValueError("WebSocket frame too large")
+    mask = await reader.readexactly(4)
+    payload = bytearray(await reader.readexactly(length))
+    for i in range(length):
+        payload[i] ^= mask[i & 3]
+    return opcode, payload
+
+async def ws_send_frame(writer, opcode, payload=b''):
+    """
+    Send one unmasked, unfragmented WebSocket frame (payload <= 125 bytes).
+    """
+    writer.write(bytes((0x80 | opcode, len(payload))))
+    if payload:
+        writer.write(payload)
+    await drain(writer)
+
+async def handle_websocket(req, reader, writer, motion):
+    """
+    Upgrade a connection to a WebSocket and stream joystick positions over it.
+
+    The browser sends text frames of the form ``"x,y,seq[,head]"`` with
+    joystick positions in -100..100, a wrapping 16-bit sequence number
+    (which may be omitted) and the head index (default 0), or ``"stop"``
+    to release the servos. Malformed or out-of-range frames are counted
+    as bad requests and skipped. The
+    connection stays open so each update costs a single small frame.
+    Sequenced moves are acknowledged with a text frame holding the
+    sequence number, which the page uses to pace itself and measure the
+    round trip; a move dropped as out of order gets no acknowledgement.
+    Sequence numbers are checked per connection. A stop is acknowledged
+    with ``"stop"`` once the servos have been released.
+
+    A connection that stays silent for ``WS_PING_MS`` is pinged, which
+    browsers answer automatically; one that stays silent for another
+    ``WS_PING_MS`` is dropped as half-open.
+
+    Args:
+        req (Request): Parsed upgrade request.
+        reader: asyncio stream reader of the client connection.
+        writer: asyncio stream writer of the client connection.
+        motion (MotionEngine): Motion engine driving the pan/tilt servos.
+    """
+    key = req.header(b'sec-websocket-key')
+    if not key:
+        writer.write(RESPONSE_BAD_REQUEST)
+        return
+    writer.write(b'HTTP/1.1 101 Switching Protocols\r\n'
+                 b'Upgrade: websocket\r\n'
+                 b'Connection: Upgrade\r\n'
+                 b'Sec-WebSocket-Accept: ')
+    writer.write(ws_accept_key(key))
+    writer.write(b'\r\n\r\n')
+    await drain(writer)
+    log.info("WebSocket client connected")
+
+    source = SeqFilter()  # Sequence numbers are this connection's own
+    pinged = False
     while True:
         try:
-            client = connection.accept()[0]
-            request = client.recv(1024).decode('utf-8')
-            if not request:
+            opcode, payload = await asyncio.wait_for(ws_read_frame(reader), WS_PING_MS / 1000)
+        except asyncio.TimeoutError:
+            if pinged:
+                raise
+            pinged = True
+            await ws_send_frame(writer, WS_PING)
+            continue
+        except EOFError:
+            break
+        pinged = False
+        if opcode == WS_TEXT:
+            if payload == b'stop':
+                log.info("Stopping servos")
+                stop(motion)
+                await ws_send_frame(writer, WS_TEXT, b'stop')
+            else:
+                try:
+                    fields = payload.decode('utf-8').split(',')
+                    if not 2 <= len(fields) <= 4:
+                        raise ValueError("Expected x,y[,seq[,head]]")
+                    x = int(fields[0])
+                    y = int(fields[1])
+                    seq = int(fields[2]) if len(fields) > 2 else None
+                    head = int(fields[3]) if len(fields) > 3 else 0
+                    if not -100 <= x <= 100 or not -100 <= y <= 100 or not 0 <= head < len(HEADS):
+                        raise ValueError("Position or head out of range")
+                except ValueError as e:
+                    # Skip the frame like a bad /move, but keep the connection
+                    metrics.count('bad_requests')
+                    log.debug("Ignoring WebSocket frame %r: %s", payload, e)
+                    continue
+                if move(motion, x, y, seq, head, source) and seq is not None:
+                    await ws_send_frame(writer, WS_TEXT, b'%d' % seq)
+        elif opcode == WS_PING:
+            await ws_send_frame(writer, WS_PONG, payload)
+        elif opcode == WS_CLOSE:
+            await ws_send_frame(writer, WS_CLOSE, payload[:2])
+            break
+    log.info("WebSocket client disconnected")
+
+def handle_move(req, reader, writer, motion):
+    """
+    Handle ``/move?x=..&y=..[&s=..][&h=..]`` with joystick positions in
+    -100..100, an optional client sequence number and an optional head
+    index into ``HEADS``.
+
+    A plain function rather than a coroutine, like ``handle_stop``: from
+    the parsed request to the mailbox nothing is allocated, not even a
+    coroutine object. Sequence numbers are checked per client IP; a move
+    older than the client's last one gets a 409.
+    """
+    x = req.param_int(b'x')
+    y = req.param_int(b'y')
+    head = req.param_int(b'h', 0)
+    if (x is None or y is None or not -100 <= x <= 100 or not -100 <= y <= 100
+            or not 0 <= head < len(HEADS)):
+        metrics.count('bad_requests')
+        writer.write(RESPONSE_BAD_REQUEST)
+    else:
+        seq = req.param_int(b's')
+        source = None if seq is None else seq_source(peer_host(writer))
+        writer.write(RESPONSE_OK if move(motion, x, y, seq, head, source) else RESPONSE_STALE)
+
+async def handle_batch(req, reader, writer, motion):
+    """
+    Handle ``/batch?c1=..&c3=..[&s=..]``, setting any subset of servos to
+    angles in degrees in one request.
+
+    All targets are validated first and posted together, so the motion
+    engine starts every listed servo in the same tick; one round trip can
+    reposition every head.
+    """
+    targets = []
+    for i in range(len(CHANNEL_PARAMS)):
+        angle = req.param_int(CHANNEL_PARAMS[i])
+        if angle is not None:
+            targets.append((i + 1, angle))
+    try:
+        if not targets:
+            raise ValueError("No servo angles given")
+        for num, angle in targets:
+            motion.mailbox.check(num, angle)
+    except ValueError:
+        metrics.count('bad_requests')
+        writer.write(RESPONSE_BAD_REQUEST)
+        return
+    seq = req.param_int(b's')
+    if seq is not None and not seq_source(peer_host(writer)).accept(seq):
+        motion.mailbox.reject(len(targets))
+        writer.write(RESPONSE_STALE)
+        return
+    motion.mailbox.post_many(targets)
+    if SEQUENCER is not None:
+        SEQUENCER.cancel()
+        PLAYER.cancel()
+    writer.write(RESPONSE_OK)
+
+def handle_stop(req, reader, writer, motion):
+    """
+    Handle ``/stop`` by halting motion and releasing the servos.
+    """
+    log.info("Stopping servos")
+    stop(motion)
+    writer.write(RESPONSE_OK)
+
+async def handle_center(req, reader, writer, motion):
+    """
+    Handle ``/center`` by easing pan and tilt back to 90 degrees.
+    """
+    PLAYER.cancel()
+    SEQUENCER.center()
+    writer.write(RESPONSE_OK)
+
+async def handle_shoot(req, reader, writer, motion):
+    """
+    Handle ``/shoot`` by pulsing the shutter once.
+    """
+    PLAYER.cancel()
+    SEQUENCER.shoot()
+    writer.write(RESPONSE_OK)
+
+async def handle_panorama(req, reader, writer, motion):
+    """
+    Handle ``/panorama?shots=..&span=..`` by starting a panorama sweep.
+    """
+    PLAYER.cancel()
+    try:
+        SEQUENCER.panorama(req.param_int(b'shots', 5), req.param_int(b'span', 90))
+    except ValueError:
+        metrics.count('bad_requests')
+        writer.write(RESPONSE_BAD_REQUEST)
+        return
+    writer.write(RESPONSE_OK)
+
+async def handle_sequence(req, reader, writer, motion):
+    """
+    Handle ``/sequence`` with the progress of the current or last sequence.
+    """
+    send_response(writer, b'200 OK', json.dumps(SEQUENCER.progress()).encode('utf-8'),
+                  b'application/json')
+
+def trajectory_name(req):
+    """
+    Get the ``name`` query parameter if it is a valid trajectory name
+    (1-16 lower-case letters, digits, ``-`` or ``_``), else None.
+    """
+    name = req.param(b'name')
+    if not name or len(name) > 16:
+        return None
+    for c in name:
+        if not (0x61 <= c <= 0x7A or 0x30 <= c <= 0x39 or c == 0x2D or c == 0x5F):
+            return None
+    return name.decode()
+
+def trajectory_path(name):
+    return f'{TRAJECTORY_DIR}/{name}.trj'
+
+async def handle_record(req, reader, writer, motion):
+    """
+    Handle ``/record?name=..`` by starting to record the head's motion.
+
+    The angles written to the pan and tilt servos are sampled every
+    motion tick until ``/record/stop``, which saves them under ``name``.
+    """
+    global RECORDING, RECORDING_NAME
+    name = trajectory_name(req)
+    if name is None:
+        metrics.count('bad_requests')
+        writer.write(RESPONSE_BAD_REQUEST)
+        return
+    if RECORDING is None:
+        RECORDING = Trajectory((1, 2), TRAJECTORY_CAPACITY)
+    RECORDING_NAME = name
+    RECORDING.start()
+    motion.controller.recorder = RECORDING
+    writer.write(RESPONSE_OK)
+
+async def handle_record_stop(req, reader, writer, motion):
+    """
+    Handle ``/record/stop`` by saving the recording to flash and
+    reporting its size and duration.
+    """
+    if RECORDING is None or motion.controller.recorder is None:
+        metrics.count('bad_requests')
+        writer.write(RESPONSE_BAD_REQUEST)
+        return
+    motion.controller.recorder = None
+    RECORDING.stop()
+    try:
+        os.mkdir(TRAJECTORY_DIR)
+    except OSError:
+        pass  # Already there
+    RECORDING.save(trajectory_path(RECORDING_NAME))
+    result = RECORDING.stats()
+    result['name'] = RECORDING_NAME
+    send_response(writer, b'200 OK', json.dumps(result).encode('utf-8'), b'application/json')
+
+async def handle_replay(req, reader, writer, motion):
+    """
+    Handle ``/replay?name=..`` by replaying a saved recording in the
+    background. Any move, stop or sequence cancels it.
+    """
+    name = trajectory_name(req)
+    try:
+        trajectory = Trajectory.load(trajectory_path(name)) if name is not None else None
+    except (OSError, ValueError):
+        trajectory = None
+    if trajectory is None:
+        metrics.count('not_found')
+        writer.write(RESPONSE_NOT_FOUND)
+        return
+    SEQUENCER.cancel()
+    PLAYER.start(name, trajectory)
+    writer.write(RESPONSE_OK)
+
+async def handle_trajectories(req, reader, writer, motion):
+    """
+    Handle ``/trajectories`` with the saved recordings, the recording in
+    progress and the replay progress.
+    """
+    try:
+        names = os.listdir(TRAJECTORY_DIR)
+    except OSError:
+        names = []
+    files = {}
+    for file in names:
+        if file.endswith('.trj'):
+            files[file[:-4]] = os.stat(trajectory_path(file[:-4]))[6]
+    recording = RECORDING.stats() if RECORDING is not None else {}
+    recording['name'] = RECORDING_NAME
+    result = {'files': files, 'recording': recording, 'replay': PLAYER.progress()}
+    send_response(writer, b'200 OK', json.dumps(result).encode('utf-8'), b'application/json')
+
+async def handle_metrics(req, reader, writer, motion):
+    """
+    Handle ``/metrics`` with latency histograms and counters.
+
+    JSON by default; Prometheus text with ``?format=prometheus`` or when
+    the client asks for ``text/plain``. ``&reset=1`` clears the
+    histograms after they are reported.
+    """
+    if (req.param(b'format') == b'prometheus'
+            or b'text/plain' in (req.header(b'accept') or b'')):
+        send_response(writer, b'200 OK', metrics.prometheus().encode('utf-8'),
+                      b'text/plain; version=0.0.4')
+    else:
+        send_response(writer, b'200 OK', json.dumps(metrics.snapshot()).encode('utf-8'),
+                      b'application/json')
+    if req.param_int(b'reset'):
+        metrics.reset()
+
+async def handle_logs(req, reader, writer, motion):
+    """
+    Handle ``/logs[?since=..][&level=..]`` with the buffered log entries.
+
+    ``since`` is the ``next`` id of the previous answer, so a client can
+    poll for new entries only; ``level`` is a level name such as
+    ``warning`` and hides the entries below it.
+    """
+    name = (req.param(b'level') or b'debug').decode().upper()
+    for value, level_name in log.NAMES.items():
+        if level_name == name:
+            break
+    else:
+        metrics.count('bad_requests')
+        writer.write(RESPONSE_BAD_REQUEST)
+        return
+    result = {'next': log.next_id(), 'entries': log.entries(req.param_int(b'since', 0), value)}
+    send_response(writer, b'200 OK', json.dumps(result).encode('utf-8'), b'application/json')
+
+def format_event(motion):
+    """
+    Format the live state as one Server-Sent Events message.
+
+    Targets and positions list every servo in order; positions are the
+    engine's interpolated angles, i.e. what the servos are being driven
+    to right now, as there is no position feedback.
+    """
+    progress = SEQUENCER.progress()
+    channels = len(motion.controller)
+    state = {
+        't': ticks_ms(),
+        'target': [int(motion.target(num)) for num in range(1, channels + 1)],
+        'position': [int(motion.position(num) + 0.5) for num in range(1, channels + 1)],
+        'moving': motion.is_moving(),
+        'sequence': progress['name'] if progress['running'] else None,
+        'step': progress['step'],
+        'steps': progress['steps'],
+        'clients': ACTIVE_CONNECTIONS,
+        'viewers': EVENTS.subscribers,
+        'requests': metrics.counters['requests'],
+        'mem_free': metrics.mem_free(),
+    }
+    return b'data: %s\n\n' % json.dumps(state).encode('utf-8')
+
+async def publish_events(motion):
+    """
+    Publish the live state every ``EVENTS_PERIOD_MS`` while anyone is
+    watching. The message is formatted once per tick and shared by all
+    viewers.
+    """
+    while True:
+        await asyncio.sleep(EVENTS_PERIOD_MS / 1000)
+        if EVENTS.subscribers:
+            start = ticks_us()
+            EVENTS.publish(format_event(motion))
+            metrics.record('events', start)
+
+async def handle_events(req, reader, writer, motion):
+    """
+    Handle ``/events``, a Server-Sent Events stream of the live state.
+
+    Viewers have their own limit, ``EVENTS_MAX_CLIENTS``, and release
+    their connection slot while subscribed so they never lock out
+    clients steering the head. Each write must complete within
+    ``WRITE_TIMEOUT_MS``; a viewer that is further behind than that is
+    dropped, and one that is merely slow skips to the newest message.
+    """
+    global ACTIVE_CONNECTIONS
+    if EVENTS.subscribers >= EVENTS_MAX_CLIENTS:
+        metrics.count('rejected')
+        writer.write(RESPONSE_UNAVAILABLE)
+        return
+    writer.write(b'HTTP/1.0 200 OK\r\nContent-Type: text/event-stream\r\n'
+                 b'Cache-Control: no-cache\r\n\r\nretry: 1000\n\n')
+    ACTIVE_CONNECTIONS -= 1
+    EVENTS.subscribers += 1
+    try:
+        while True:
+            await drain(writer)
+            writer.write(await EVENTS.wait())
+    finally:
+        EVENTS.subscribers -= 1
+        ACTIVE_CONNECTIONS += 1
+
+# Exact path (without query string) -> handler(req, reader, writer, motion)
+ROUTES = (
+    (b'/move', handle_move),
+    (b'/batch', handle_batch),
+    (b'/stop', handle_stop),
+    (b'/center', handle_center),
+    (b'/shoot', handle_shoot),
+    (b'/panorama', handle_panorama),
+    (b'/sequence', handle_sequence),
+    (b'/record', handle_record),
+    (b'/record/stop', handle_record_stop),
+    (b'/replay', handle_replay),
+    (b'/trajectories', handle_trajectories),
+    (b'/metrics', handle_metrics),
+    (b'/logs', handle_logs),
+    (b'/events', handle_events),
+    (b'/ws', handle_websocket),
+)
+
+# Handlers that keep the connection for a whole session; their lifetime
+# is not a request latency and stays out of the 'send' and 'request' timers
+SESSION_HANDLERS = (handle_events, handle_websocket)
+
+async def handle_client(reader, writer, motion):
+    """
+    Serve a single HTTP connection.
+
+    Every connection runs as its own task, so a slow client only stalls
+    itself while other requests and servo updates keep being processed.
+    The request is parsed in a pooled buffer and dispatched through
+    ``ROUTES``.
+
+    No HTTP client can hold a connection slot for longer than
+    ``READ_TIMEOUT_MS`` plus twice ``WRITE_TIMEOUT_MS``: the head must
+    arrive within the read timeout, and the response body and the final
+    flush must each go out within the write timeout. Beyond
+    ``MAX_CONNECTIONS`` clients are refused with a 503 before anything is
+    read.
+
+    Args:
+        reader: asyncio stream reader of the client connection.
+        writer: asyncio stream writer of the client connection.
+        motion (MotionEngine): Motion engine driving the pan/tilt servos.
+    """
+    global ACTIVE_CONNECTIONS
+    start = ticks_us()
+    metrics.count('connections')
+    if ACTIVE_CONNECTIONS >= MAX_CONNECTIONS:
+        metrics.count('rejected')
+        writer.write(RESPONSE_UNAVAILABLE)
+        await close(writer)
+        return
+    ACTIVE_CONNECTIONS += 1
+    req = REQUEST_POOL.pop() if REQUEST_POOL else Request(REQUEST_SIZE)
+    timed_out = False
+    session = False
+    try:
+        if not await asyncio.wait_for(req.read(reader), READ_TIMEOUT_MS / 1000):
+            if req.length == len(req.buf):
+                metrics.count('bad_requests')
+                writer.write(RESPONSE_TOO_LARGE)
+            elif req.length:
+                metrics.count('bad_requests')
+                writer.write(RESPONSE_BAD_REQUEST)
+            await drain(writer)
+            return
+        stage = metrics.record('recv', start)
+
+        metrics.count('requests')
+        if not req.parse():
+            metrics.count('bad_requests')
+            writer.write(RESPONSE_BAD_REQUEST)
+        else:
+            for path, handler in ROUTES:
+                if req.path_is(path):
+                    stage = metrics.record('parse', stage)
+                    session = handler in SESSION_HANDLERS
+                    result = handler(req, reader, writer, motion)
+                    if result is not None:
+                        await result  # Coroutine handlers; the hot ones are plain functions
+                    break
+            else:
+                entry = find_static(req)
+                if entry is not None:
+                    stage = metrics.record('parse', stage)
+                    await send_static(req, writer, entry)
+                else:
+                    metrics.count('not_found')
+                    writer.write(RESPONSE_NOT_FOUND)
+        stage = ticks_us()
+        await drain(writer)
+        if not session:
+            metrics.record('send', stage)
+            metrics.record('request', start)
+    except asyncio.TimeoutError:
+        metrics.count('timeouts')
+        timed_out = True
+    except OSError:
+        metrics.count('disconnects')  # The client went away mid-response
+    except Exception as e:
+        metrics.count('errors')
+        log.error("Error in serve loop: %r", e)
+    finally:
+        ACTIVE_CONNECTIONS -= 1
+        # Closed first: a flush may still be sending from the buffer
+        await close(writer, timed_out)
+        req.reset()
+        REQUEST_POOL.append(req)
+
+def gc_idle(motion):
+    """
+    Check whether a garbage collection pause would go unnoticed: no servo
+    is moving and no command arrived since the previous check.
+    """
+    global IDLE_RECEIVED
+    received = motion.mailbox.received
+    idle = received == IDLE_RECEIVED and not motion.is_moving()
+    IDLE_RECEIVED = received
+    return idle
+
+def server_stats():
+    """
+    Get the number of open and allowed client connections.
+    """
+    return {'active': ACTIVE_CONNECTIONS, 'max': MAX_CONNECTIONS}
+
+def handle_udp_packet(buf, motion, addr):
+    """
+    Apply one joystick packet from the UDP channel.
+
+    Out-of-order packets are dropped by the sender's sequence check,
+    exactly like sequenced HTTP and WebSocket moves, and are not echoed.
+
+    Args:
+        buf (bytearray): The packet.
+        motion (MotionEngine): Motion engine driving the pan/tilt servos.
+        addr: Sender address, whose sequence numbers are tracked.
+
+    Returns:
+        bool: True if the sender asked for the packet to be echoed.
+    """
+    packet = udpcontrol.unpack(buf)
+    if packet is None:
+        metrics.count('udp_malformed')
+        return False
+    flags, seq, x, y = packet
+    head = flags >> udpcontrol.HEAD_SHIFT
+    metrics.count('udp_packets')
+    if flags & udpcontrol.FLAG_STOP:
+        stop(motion)
+    elif -100 <= x <= 100 and -100 <= y <= 100 and head < len(HEADS):
+        if not move(motion, x, y, seq, head, seq_source(addr)):
+            return False
+    else:
+        metrics.count('udp_malformed')
+    return bool(flags & udpcontrol.FLAG_ACK)
+
+async def serve_udp(motion, host, port=UDP_PORT):
+    """
+    Receive fixed-size joystick packets on a UDP port until cancelled.
+
+    CPython's event loop waits for datagrams directly and reads them into
+    one reused buffer. MicroPython's cannot wait on a datagram socket, so
+    it is checked for readability every ``UDP_POLL_MS`` with ``ipoll``,
+    which allocates nothing, and only read once a datagram is waiting;
+    ``recvfrom`` then still allocates the packet and its address.
+
+    Args:
+        motion (MotionEngine): Motion engine driving the pan/tilt servos.
+        host (str): Address to bind to.
+        port (int): UDP port to listen on (default 5005).
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(socket.getaddrinfo(host, port)[0][-1])
+    sock.setblocking(False)
+    buf = bytearray(udpcontrol.SIZE)
+    loop = asyncio.get_event_loop()
+    recvfrom_into = getattr(loop, 'sock_recvfrom_into', None)
+    if recvfrom_into is None:
+        poller = select.poll()
+        poller.register(sock, select.POLLIN)
+    log.info("UDP control listening on %s:%d...", host, port)
+    try:
+        while True:
+            if recvfrom_into is not None:
+                n, addr = await recvfrom_into(sock, buf)
+            else:
+                # An empty non-blocking recvfrom() would raise, allocating
+                # an OSError hundreds of times a second while idle
+                ready = False
+                for _ in poller.ipoll(0):
+                    ready = True
+                if not ready:
+                    await asyncio.sleep_ms(UDP_POLL_MS)
+                    continue
+                try:
+                    data, addr = sock.recvfrom(udpcontrol.SIZE)
+                except OSError:
+                    continue
+                n = len(data)
+                buf[:n] = data
+            if n != udpcontrol.SIZE:
+                metrics.count('udp_malformed')
                 continue
-            print(f"Request: {request}")
-
-            path = request.split(' ')[1]
-            
-            if path.startswith('/move'):
-                if '?' in path:
-                    params = path.split('?')[1].split('&')
-                    x = int(params[0].split('=')[1])
-                    y = int(params[1].split('=')[1])
-
-                    # Map x and y to specific servo movements
-                    servo_x_angle = (x + 100) * 90 // 100  # Normalize to 0-180
-                    servo_y_angle = (y + 100) * 90 // 100  # Normalize to 0-180
-                    
-                    print(f"Setting Servo 1 to {servo_x_angle} and Servo 2 to {servo_y_angle}")
-                    servo.servo(1, servo_x_angle)
-                    servo.servo(2, servo_y_angle)
-# 
-#             if path.startswith('/move'):
-#                 if '?' in path:
-#                     params = path.split('?')[1].split('&')
-#                     x = int(params[0].split('=')[1])
-#                     y = int(params[1].split('=')[1])
-# 
-#                     # Map normalized joystick values (-100 to 100) to servo angles (0 to 180)
-#                     target_x_angle = int((x + 100) * 180 / 200)  # Normalize to 0-180
-#                     target_y_angle = int((y + 100) * 180 / 200)  # Normalize to 0-180
-# 
-# #                     print(f"Moving Servo 1 to {target_x_angle} and Servo 2 to {target_y_angle} smoothly")
-#                     
-#                     # Use smooth_move to transition the servos
-#                     servo.smooth_move(1, 90, target_x_angle, step=1, delay=0.02)  # Smooth move for Servo 1
-#                     servo.smooth_move(2, 90, target_y_angle, step=1, delay=0.02)  # Smooth move for Servo 2
-                    
-            elif path.startswith('/stop'):
-                print("Stopping servos")
-                servo.release()
-
-            html = webpage()
-            client.send('HTTP/1.0 200 OK\r\nContent-type: text/html\r\n\r\n')
-            client.send(html)
-        except Exception as e:
-            print(f"Error in serve loop: {e}")
+            if handle_udp_packet(buf, motion, addr):
+                try:
+                    sock.sendto(buf, addr)
+                except OSError:
+                    pass
+    finally:
+        sock.close()
+
+async def serve(motion, wifi, port=PORT, udp_port=UDP_PORT):
+    """
+    Run the HTTP control server until the task is cancelled.
+
+    The motion engine is ticked by its own thread (the second core) if
+    its mailbox was created with a lock, otherwise by a hardware timer
+    where available, otherwise by a task on the same event loop.
+
+    When the Wi-Fi link drops the listeners are closed, the link is
+    re-established and the server binds again, while the motion engine
+    keeps holding the servos where they are.
+
+    Args:
+        motion (MotionEngine): Motion engine driving the pan/tilt servos.
+        wifi (Wifi): Station interface to connect and supervise.
+        port (int): TCP port to listen on (default 80).
+        udp_port (int): UDP port for binary joystick packets, or None.
+    """
+    global SEQUENCER, EVENTS, PLAYER, CHANNEL_PARAMS
+    asyncio.create_task(log.run())
+    metrics.sources['log'] = log.stats
+    scan_static()
+    for _ in range(MAX_CONNECTIONS):
+        REQUEST_POOL.append(Request(REQUEST_SIZE))
+    CHANNEL_PARAMS = tuple(b'c%d' % num for num in range(1, len(motion.controller) + 1))
+    metrics.sources['commands'] = motion.mailbox.stats
+    metrics.sources['motion'] = motion.stats
+    shutter = Pin(SHUTTER_PIN, Pin.OUT, value=0) if SHUTTER_PIN is not None else None
+    SEQUENCER = Sequencer(motion, shutter)
+    metrics.sources['sequence'] = SEQUENCER.progress
+    PLAYER = Player(motion)
+    metrics.sources['replay'] = PLAYER.progress
+    EVENTS = Broadcast()
+    metrics.sources['events'] = EVENTS.stats
+    asyncio.create_task(publish_events(motion))
+    metrics.sources['wifi'] = wifi.stats
+    metrics.sources['server'] = server_stats
+    heap.setup(GC_THRESHOLD_FRACTION)
+    metrics.sources['heap'] = heap.stats
+    asyncio.create_task(heap.run(lambda: gc_idle(motion)))
+    if motion.mailbox.threaded:
+        motion.start_thread()
+    elif not motion.start_timer():
+        asyncio.create_task(motion.run())
+    while True:
+        host = await wifi.wait_ready()
+        try:
+            server = await asyncio.start_server(
+                lambda reader, writer: handle_client(reader, writer, motion),
+                host, port, backlog=BACKLOG)
+        except OSError as e:
+            log.error("Could not listen on %s:%d: %s", host, port, e)
+            await asyncio.sleep(1)
+            continue
+        udp_task = asyncio.create_task(serve_udp(motion, host, udp_port)) if udp_port is not None else None
+        wifi.mark_ready()
+        log.info("Server listening on %s:%d...", host, port)
+        try:
+            await wifi.wait_lost()
         finally:
-            client.close()
+            # Open connections die with the link; just stop accepting
+            server.close()
+            if udp_task is not None:
+                udp_task.cancel()
 
 # def serve(connection, servo):
 #     while True:
@@ -476,25 +1242,29 @@ def serve(connection, servo):
 #         finally:
 #             client.close()
 
-def main():
+def main(port=PORT, udp_port=UDP_PORT, dual_core=DUAL_CORE):
+    wifi = Wifi(NETWORKS, WIFI_STATE, static=WIFI_STATIC)
     servo = ServoController()
     servo.servo(4, 90)  # Initial positions for the servos
     servo.servo(3, 90)
     servo.servo(2, 180)
     servo.servo(1, 90)
+    lock = None
+    if dual_core:
+        import _thread
+        lock = _thread.allocate_lock()
+    motion = MotionEngine(servo, mailbox=CommandMailbox(len(servo), lock=lock))
     try:
-        ip, wlan = connect()
-        connection = open_socket(ip)
-        serve(connection, servo)
+        asyncio.run(serve(motion, wifi, port, udp_port))
     except Exception as e:
-        print(f"An error occurred: {e}")
+        log.error("An error occurred: %r", e)
     finally:
-        if 'connection' in locals():
-            connection.close()
-        if 'wlan' in locals():
-            wlan.disconnect()
+        # Wi-Fi drops are handled in serve(); only a crash gets here
+        wifi.disconnect()
+        motion.deinit()
         servo.release()
-        print("Resetting in 5 seconds...")
+        log.warning("Resetting in 5 seconds...")
+        log.flush()
         sleep(5)
         import machine
         machine.reset()
@@ -0,0 +1,286 @@
+const joystickKnob = document.querySelector('.joystick-handle');
+const joystickContainer = document.querySelector('.joystick-container');
+const viewport = document.querySelector('.viewport');
+const crosshair = document.querySelector('.crosshair');
+const status = document.getElementById('status');
+
+const rttDisplay = document.getElementById('rtt');
+const headDisplay = document.getElementById('head');
+
+// Stick sampling: at most SEND_HZ moves a second, only when the stick moved
+// beyond DEADBAND, and at most one move awaiting its reply at a time
+const SEND_HZ = 30;
+const DEADBAND = 2;  // Stick units (-100..100) of hand jitter to ignore
+const MOVE_TIMEOUT_MS = 1000;  // An unanswered move stops blocking after this
+
+let isDragging = false;
+let seq = 0;
+let wantPan = 0;
+let wantTilt = 0;
+let sentPan = 0;
+let sentTilt = 0;
+let exact = false;  // Send the final position even within the deadband
+let lastSend = -Infinity;
+let inFlight = null;
+let pumping = false;
+let stickEvents = 0;
+let movesSent = 0;
+let rttAverage = null;
+let currentX = 150;
+let currentY = 150;
+const centerX = 150;
+const centerY = 150;
+const maxDistance = 120;
+
+// Joystick control
+function handleJoystickMove(clientX, clientY) {
+    const rect = joystickContainer.getBoundingClientRect();
+    let deltaX = clientX - rect.left - centerX;
+    let deltaY = clientY - rect.top - centerY;
+
+    // Limit the joystick movement to the container
+    const distance = Math.sqrt(deltaX * deltaX + deltaY * deltaY);
+    if (distance > maxDistance) {
+        deltaX = (deltaX / distance) * maxDistance;
+        deltaY = (deltaY / distance) * maxDistance;
+    }
+
+    currentX = centerX + deltaX;
+    currentY = centerY + deltaY;
+
+    joystickKnob.style.left = `${currentX - 30}px`;
+    joystickKnob.style.top = `${currentY - 30}px`;
+
+    // Convert joystick position to stick values in -100..100; the
+    // Pico maps those to 0-180 degrees, so +/-72 is +/-65 degrees
+    const panValue = Math.round((deltaX / maxDistance) * 72);
+    const tiltValue = Math.round((deltaY / maxDistance) * 72);
+
+    queueMove(panValue, tiltValue);
+}
+
+// Remember the newest stick position; the animation frame loop sends it
+function queueMove(pan, tilt) {
+    stickEvents++;
+    wantPan = pan;
+    wantTilt = tilt;
+    if (!pumping) {
+        pumping = true;
+        requestAnimationFrame(pump);
+    }
+}
+
+function pump(now) {
+    const threshold = exact ? 0 : DEADBAND;
+    if (Math.abs(wantPan - sentPan) <= threshold && Math.abs(wantTilt - sentTilt) <= threshold) {
+        pumping = false;
+        return;
+    }
+    if (inFlight && now - inFlight.start > MOVE_TIMEOUT_MS) {
+        inFlight = null;
+    }
+    const interval = 1000 / SEND_HZ;
+    if (!inFlight && now - lastSend >= interval) {
+        // Advance by whole intervals so frame timing does not lower the rate
+        lastSend = Math.max(lastSend + interval, now - interval);
+        sentPan = wantPan;
+        sentTilt = wantTilt;
+        sendCommand({
+            action: 'move',
+            pan: wantPan,
+            tilt: wantTilt
+        });
+    }
+    requestAnimationFrame(pump);
+}
+
+// Called with the sequence number the Pico acknowledged
+function moveAnswered(answered) {
+    if (!inFlight || answered !== inFlight.seq) {
+        return;
+    }
+    const rtt = performance.now() - inFlight.start;
+    inFlight = null;
+    rttAverage = rttAverage === null ? rtt : rttAverage * 0.9 + rtt * 0.1;
+    rttDisplay.textContent = `RTT: ${rtt.toFixed(1)} ms (avg ${rttAverage.toFixed(1)} ms), ` +
+        `sent ${movesSent} moves for ${stickEvents} stick events`;
+}
+
+joystickKnob.addEventListener('mousedown', startDragging, { passive: true });
+document.addEventListener('mousemove', moveJoystick, { passive: true });
+document.addEventListener('mouseup', stopDragging, { passive: true });
+
+// Touch events for mobile
+joystickKnob.addEventListener('touchstart', (e) => {
+    startDragging(e.touches[0]);
+}, { passive: true });
+
+document.addEventListener('touchmove', (e) => {
+    if (isDragging) {
+        moveJoystick(e.touches[0]);
+    }
+}, { passive: true });
+
+document.addEventListener('touchend', stopDragging, { passive: true });
+
+function startDragging(e) {
+    isDragging = true;
+    exact = false;
+}
+
+function moveJoystick(e) {
+    if (isDragging) {
+        handleJoystickMove(e.clientX, e.clientY);
+    }
+}
+
+function stopDragging() {
+    isDragging = false;
+    exact = true;
+    if (!pumping) {
+        pumping = true;
+        requestAnimationFrame(pump);
+    }
+}
+
+// Point-to-shoot control
+if (viewport) viewport.addEventListener('click', (e) => {
+    const rect = viewport.getBoundingClientRect();
+    const x = e.clientX - rect.left;
+    const y = e.clientY - rect.top;
+
+    crosshair.style.left = `${x}px`;
+    crosshair.style.top = `${y}px`;
+
+    // Convert viewport coordinates to stick values in -100..100
+    const panValue = Math.round((x / viewport.clientWidth) * 200 - 100);
+    const tiltValue = Math.round((y / viewport.clientHeight) * 200 - 100);
+
+    exact = true;
+    queueMove(panValue, tiltValue);
+});
+
+// Camera control functions
+function takeShot() {
+    sendCommand({ action: 'shoot' });
+}
+
+function centerCamera() {
+    sendCommand({ action: 'center' });
+}
+
+function startPanorama() {
+    sendCommand({
+        action: 'panorama',
+        num_shots: 5,
+        span_angle: 90
+    });
+}
+
+function stopServos() {
+    // Forget any move still waiting for its frame
+    sentPan = wantPan;
+    sentTilt = wantTilt;
+    sendCommand({ action: 'stop' });
+}
+
+// Command sender
+
+const PICO_HOST = location.hostname === '' ? 'http://pico.local' : '';
+const WS_URL = (PICO_HOST ? PICO_HOST.replace(/^http/, 'ws') : `ws://${location.host}`) + '/ws';
+
+// Persistent joystick channel: one small frame per update
+let socket = null;
+
+function openSocket() {
+    const ws = new WebSocket(WS_URL);
+    ws.onopen = () => {
+        socket = ws;
+        status.textContent = 'Status: connected';
+    };
+    ws.onmessage = (e) => moveAnswered(Number(e.data));
+    ws.onclose = () => {
+        socket = null;
+        inFlight = null;
+        setTimeout(openSocket, 1000);
+    };
+}
+
+openSocket();
+
+function sendCommand(cmd) {
+    if (cmd.action === 'move') {
+        // Lets the Pico drop moves that arrive out of order
+        seq = (seq + 1) & 0xFFFF;
+        inFlight = { seq: seq, start: performance.now() };
+        movesSent++;
+    }
+
+    // Stream moves and stops over the WebSocket while it is open
+    if (socket && socket.readyState === WebSocket.OPEN) {
+        if (cmd.action === 'move') {
+            socket.send(`${cmd.pan ?? 0},${cmd.tilt ?? 0},${seq}`);
+            return;
+        }
+        if (cmd.action === 'stop') {
+            socket.send('stop');
+            return;
+        }
+    }
+
+    // Build a query string: /move?x=13&y=-44   or   /shoot
+    let url;
+    switch (cmd.action) {
+        case 'move':
+            // default to 0 if pan/tilt omitted
+            url = `${PICO_HOST}/move?x=${cmd.pan ?? 0}&y=${cmd.tilt ?? 0}&s=${seq}`;
+            break;
+        case 'center':
+            url = `${PICO_HOST}/center`;
+            break;
+        case 'panorama':
+            url = `${PICO_HOST}/panorama?shots=${cmd.num_shots}&span=${cmd.span_angle}`;
+            break;
+        case 'shoot':
+            url = `${PICO_HOST}/shoot`;
+            break;
+        case 'stop':
+            url = `${PICO_HOST}/stop`;
+            break;
+        default:
+            console.warn('Unknown action'); return;
+    }
+
+    const sentSeq = seq;
+    fetch(url)
+        .then(r => r.text().then(txt => {
+            status.textContent = 'Status: ' + txt.trim();
+            // A 409 means the move was dropped as out of order
+            if (cmd.action === 'move' && r.ok) {
+                moveAnswered(sentSeq);
+            }
+        }))
+        .catch(err => status.textContent = 'Error: ' + err);
+}
+
+// Live head state pushed by the Pico, shared with every other viewer
+function watchHead() {
+    if (!window.EventSource) {
+        return;
+    }
+    const events = new EventSource(`${PICO_HOST}/events`);
+    events.onmessage = (e) => {
+        const state = JSON.parse(e.data);
+        const [pan, tilt] = state.position;
+        const [panTarget, tiltTarget] = state.target;
+        let text = `Head: pan ${pan}\u00b0 (target ${panTarget}\u00b0), ` +
+            `tilt ${tilt}\u00b0 (target ${tiltTarget}\u00b0)`;
+        text += state.moving ? ', moving' : ', still';
+        if (state.sequence) {
+            text += `, ${state.sequence} ${state.step}/${state.steps}`;
+        }
+        headDisplay.textContent = text + ` \u2014 ${state.viewers} watching, ${state.clients} connected`;
+    };
+}
+
+watchHead();